@@ -5,6 +5,14 @@ import sys
 from ovation.conversion import asclass
 from ovation.importer import import_main
 from ovation_neo.importer import import_file
+from ovation_neo.follow import follow_file
+from ovation_neo.compression import ArrayCompressor, CODECS, DEFAULT_CHUNK_LENGTH
+from ovation_neo.throttle import UploadThrottle, parse_rate
+from ovation_neo.overview import DEFAULT_FACTORS, parse_factors
+from ovation_neo.spikes import DEFAULT_BIN_WIDTHS_MS, parse_bin_widths
+from ovation_neo.summary import parse_clip_range
+from ovation_neo.shard import ClaimDirectory, SHARD_STRATEGIES, parse_shard, shard_files
+from ovation_neo.daemon import ImportDaemon
 
 DESCRIPTION="""Import physiology data into an existing Ovation Experiment"""
 
@@ -15,8 +23,37 @@ def main(argv=sys.argv, dsc=None):
                   files=None,
                   sources=None,
                   equipment_setup_root=None,
+                  max_upload_rate=None,
+                  max_pending_uploads=None,
+                  follow=False,
+                  follow_poll_interval=30,
+                  follow_idle_timeout=300,
+                  codec=None,
+                  codec_chunk_length=DEFAULT_CHUNK_LENGTH,
+                  codec_threads=None,
+                  overview=False,
+                  overview_factors=DEFAULT_FACTORS,
+                  summary_statistics=False,
+                  clip_range=None,
+                  spike_index=False,
+                  spike_bin_widths=DEFAULT_BIN_WIDTHS_MS,
+                  shard=None,
+                  shard_strategy='hash',
+                  lock_dir=None,
+                  claim_timeout=3600,
+                  claim_root=None,
+                  watch=None,
+                  watch_settle_time=30,
+                  watch_batch_interval=60,
+                  watch_poll_interval=10,
+                  watch_status_file=None,
                   **args):
 
+        if watch and lock_dir is None:
+            # The daemon only remembers imported files through the lock directory, so without it every
+            # file in the watched directories would be imported again on each start
+            raise ValueError("--watch requires --lock-dir")
+
         container = data_context.getObjectWithURI(container)
         protocol_entity = data_context.getObjectWithURI(protocol)
         if protocol_entity:
@@ -26,12 +63,89 @@ def main(argv=sys.argv, dsc=None):
 
         sources = [data_context.getObjectWithURI(source) for source in sources]
 
-        for file in files:
-            import_file(file,
-                        container,
-                        equipment_setup_root,
-                        sources,
-                        protocol=protocol)
+        if max_upload_rate is not None or max_pending_uploads is not None:
+            upload_throttle = UploadThrottle(max_rate=max_upload_rate,
+                                             max_pending=max_pending_uploads)
+        else:
+            upload_throttle = None
+
+        if codec is not None:
+            compressor = ArrayCompressor(codec=codec,
+                                         chunk_length=codec_chunk_length,
+                                         threads=codec_threads)
+        else:
+            compressor = None
+
+        if not overview:
+            overview_factors = None
+
+        if not spike_index:
+            spike_bin_widths = None
+
+        if shard is not None:
+            (shard_index, shard_count) = shard
+            files = shard_files(files, shard_index, shard_count, strategy=shard_strategy)
+
+        if lock_dir is not None:
+            claims = ClaimDirectory(lock_dir, timeout=claim_timeout, root=claim_root)
+        else:
+            claims = None
+
+        def import_one(file):
+            if follow:
+                follow_file(file,
+                            container,
+                            equipment_setup_root,
+                            sources,
+                            protocol=protocol,
+                            upload_throttle=upload_throttle,
+                            compressor=compressor,
+                            overview_factors=overview_factors,
+                            summary_statistics=summary_statistics,
+                            clip_ranges=clip_range,
+                            spike_bin_widths=spike_bin_widths,
+                            poll_interval=follow_poll_interval,
+                            idle_timeout=follow_idle_timeout)
+            else:
+                import_file(file,
+                            container,
+                            equipment_setup_root,
+                            sources,
+                            protocol=protocol,
+                            upload_throttle=upload_throttle,
+                            compressor=compressor,
+                            overview_factors=overview_factors,
+                            summary_statistics=summary_statistics,
+                            clip_ranges=clip_range,
+                            spike_bin_widths=spike_bin_widths)
+
+        # Returns False if the file was skipped because it is done or claimed by another node
+        def import_claimed(file):
+            if claims is None:
+                import_one(file)
+                return True
+
+            with claims.hold(file) as claimed:
+                if claimed:
+                    import_one(file)
+
+            return claimed
+
+        imported = [file for file in files if import_claimed(file)]
+
+        if watch:
+            daemon = ImportDaemon(watch,
+                                  import_claimed,
+                                  settle_time=watch_settle_time,
+                                  batch_interval=watch_batch_interval,
+                                  poll_interval=watch_poll_interval,
+                                  status_file=watch_status_file,
+                                  is_done=claims.is_done)
+            daemon.mark_finished(imported)
+            daemon.run()
+
+        if compressor is not None:
+            compressor.close()
 
         return 0
 
@@ -42,6 +156,100 @@ def main(argv=sys.argv, dsc=None):
         equipment_group.add_argument('--equipment-setup-root',
                                      help='Physiology hardware root in Equipment setup')
 
+        upload_group = parser.add_argument_group('uploads')
+        upload_group.add_argument('--max-upload-rate',
+                                  type=parse_rate,
+                                  help='Maximum average rate of data submitted for upload in bytes/s (e.g. 500K, 2.5M); files still upload at full speed, so this does not cap peak bandwidth')
+        upload_group.add_argument('--max-pending-uploads',
+                                  type=int,
+                                  help='Maximum number of data files waiting for upload before importing pauses')
+
+        codec_group = parser.add_argument_group('compression')
+        codec_group.add_argument('--codec',
+                                 choices=sorted(CODECS.keys()),
+                                 help='Compress measurement and analysis data with the given lossless codec')
+        codec_group.add_argument('--codec-chunk-length',
+                                 type=int,
+                                 default=DEFAULT_CHUNK_LENGTH,
+                                 help='Samples per independently compressed chunk (default {})'.format(DEFAULT_CHUNK_LENGTH))
+        codec_group.add_argument('--codec-threads',
+                                 type=int,
+                                 help='Number of compression threads (default: number of CPUs)')
+
+        analysis_group = parser.add_argument_group('derived data')
+        analysis_group.add_argument('--summary-statistics',
+                                    action='store_true',
+                                    help='Store mean, RMS, min/max, extreme-value fraction and noise estimate of each analog signal as properties')
+        analysis_group.add_argument('--clip-range',
+                                    type=parse_clip_range,
+                                    action='append',
+                                    metavar='LOW,HIGH<UNITS>',
+                                    help='Acquisition range (e.g. --clip-range=-10,10V) for the clipping fraction summary statistic of signals in compatible units (may be repeated for different kinds of channel)')
+        analysis_group.add_argument('--overview',
+                                    action='store_true',
+                                    help='Store a min/max/mean overview pyramid of each analog signal')
+        analysis_group.add_argument('--overview-factors',
+                                    type=parse_factors,
+                                    default=DEFAULT_FACTORS,
+                                    help='Comma-separated overview decimation factors (default {})'.format(','.join(str(f) for f in DEFAULT_FACTORS)))
+        analysis_group.add_argument('--spike-index',
+                                    action='store_true',
+                                    help='Store a spike sample index and binned spike counts of each spike train')
+        analysis_group.add_argument('--spike-bin-widths',
+                                    type=parse_bin_widths,
+                                    default=DEFAULT_BIN_WIDTHS_MS,
+                                    help='Comma-separated spike count bin widths in ms (default {})'.format(','.join(str(w) for w in DEFAULT_BIN_WIDTHS_MS)))
+
+        batch_group = parser.add_argument_group('batch')
+        batch_group.add_argument('--shard',
+                                 type=parse_shard,
+                                 help='Import only shard i/N (0 <= i < N) of the input files. All nodes must be given the same file list.')
+        batch_group.add_argument('--shard-strategy',
+                                 choices=SHARD_STRATEGIES,
+                                 default='hash',
+                                 help='Assign files to shards by path hash or balanced by file size (default hash)')
+        batch_group.add_argument('--lock-dir',
+                                 help='Shared directory for file claims, so that nodes never import the same file twice')
+        batch_group.add_argument('--claim-timeout',
+                                 type=float,
+                                 default=3600,
+                                 help='Seconds after which the claim of an unresponsive node is released (default 3600)')
+        batch_group.add_argument('--claim-root',
+                                 help='Identify claimed files by their path relative to this directory, for nodes that mount the data at different paths (default: absolute paths)')
+
+        watch_group = parser.add_argument_group('watch')
+        watch_group.add_argument('--watch',
+                                 action='append',
+                                 metavar='DIRECTORY',
+                                 help='After importing the given files, keep running and import new files written to DIRECTORY (may be repeated; requires --lock-dir)')
+        watch_group.add_argument('--watch-settle-time',
+                                 type=float,
+                                 default=30,
+                                 help='Seconds a file must be unchanged before it is imported (default 30)')
+        watch_group.add_argument('--watch-batch-interval',
+                                 type=float,
+                                 default=60,
+                                 help='Minimum seconds between import batches (default 60)')
+        watch_group.add_argument('--watch-poll-interval',
+                                 type=float,
+                                 default=10,
+                                 help='Seconds between directory scans (default 10)')
+        watch_group.add_argument('--watch-status-file',
+                                 help='Write queue depth and import latency as JSON to this file')
+
+        follow_group = parser.add_argument_group('follow')
+        follow_group.add_argument('--follow',
+                                  action='store_true',
+                                  help='Import segments incrementally while the file(s) are still being recorded')
+        follow_group.add_argument('--follow-poll-interval',
+                                  type=float,
+                                  default=30,
+                                  help='Seconds between checks for new data (default 30)')
+        follow_group.add_argument('--follow-idle-timeout',
+                                  type=float,
+                                  default=300,
+                                  help='Seconds without new data after which a recording is complete (default 300)')
+
         return parser
 
 
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides lossless, chunked compression of numeric data before it is inserted into Ovation
+
+Arrays are flattened and split into fixed-length chunks. Each chunk is passed through the codec's
+filters (e.g. delta, byte-shuffle) and compressor independently on a thread pool, so chunks can be
+compressed in parallel and decoded individually. The result is a self-describing byte payload::
+
+    MAGIC | header length (uint32, little endian) | JSON header | chunk 0 | chunk 1 | ...
+
+The JSON header records the codec, dtype, shape, units and compressed size of each chunk.
+"""
+
+import json
+import os
+import struct
+import time
+import zlib
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+import quantities as pq
+
+try:
+    import lz4.block as lz4
+except ImportError:
+    # lz4 is optional
+    lz4 = None
+
+from ovation_neo.importer import log_info
+
+__copyright__ = 'Copyright (c) 2013. Physion Consulting. All rights reserved.'
+
+
+try:
+    _tobytes = np.ndarray.tobytes
+except AttributeError:
+    # numpy < 1.9
+    _tobytes = np.ndarray.tostring
+
+
+# CPU time of the calling thread (Python 3.7+). Without it, compression CPU time can only be estimated
+# by the CPU time of the whole process, including the Ovation client's upload threads, while compressing.
+_thread_cpu_time = getattr(time, 'thread_time', None)
+
+if _thread_cpu_time is not None:
+    CPU_TIME_LABEL = 'compression CPU'
+else:
+    CPU_TIME_LABEL = 'process CPU during compression'
+
+
+MAGIC = b'ONC1'
+DEFAULT_CHUNK_LENGTH = 2 ** 18 # samples
+
+
+def delta_encode(chunk):
+    """Replace each element after the first by its (wrapping) difference from its predecessor"""
+
+    values = chunk.view('u{}'.format(chunk.dtype.itemsize))
+    encoded = np.empty_like(values)
+    encoded[:1] = values[:1]
+    np.subtract(values[1:], values[:-1], out=encoded[1:])
+    return encoded.view(chunk.dtype)
+
+
+def delta_decode(chunk):
+    values = chunk.view('u{}'.format(chunk.dtype.itemsize))
+    return np.cumsum(values, dtype=values.dtype).view(chunk.dtype)
+
+
+def shuffle_encode(chunk):
+    """Group the i-th bytes of all elements together (improves compression of slowly varying data)"""
+
+    return np.ascontiguousarray(chunk.view(np.uint8).reshape(-1, chunk.dtype.itemsize).T).view(np.uint8)
+
+
+def shuffle_decode(chunk, dtype):
+    return np.ascontiguousarray(chunk.reshape(dtype.itemsize, -1).T).view(dtype).ravel()
+
+
+class Codec(object):
+    """A chain of reversible filters followed by a byte compressor
+
+    Parameters
+    ----------
+    name : str
+        Codec name, recorded with the compressed data
+    compress : callable
+        bytes => compressed bytes
+    decompress : callable
+        (compressed bytes, uncompressed length) => bytes
+    delta : bool, optional
+        Apply delta filter before compression
+    shuffle : bool, optional
+        Apply byte-shuffle filter before compression
+    """
+
+    def __init__(self, name, compress, decompress, delta=False, shuffle=False):
+        self.name = name
+        self.compress = compress
+        self.decompress = decompress
+        self.delta = delta
+        self.shuffle = shuffle
+
+    def encode(self, chunk):
+        if self.delta:
+            chunk = delta_encode(chunk)
+        if self.shuffle:
+            chunk = shuffle_encode(chunk)
+
+        return self.compress(_tobytes(chunk))
+
+    def decode(self, data, dtype, length):
+        raw = np.frombuffer(self.decompress(data, length * dtype.itemsize), dtype=np.uint8)
+        if self.shuffle:
+            chunk = shuffle_decode(raw, dtype)
+        else:
+            chunk = raw.view(dtype)
+        if self.delta:
+            chunk = delta_decode(chunk)
+
+        return chunk
+
+
+def _zlib_compress(data):
+    return zlib.compress(data, 6)
+
+def _zlib_decompress(data, length):
+    return zlib.decompress(data)
+
+def _lz4_compress(data):
+    return lz4.compress(data, store_size=False)
+
+def _lz4_decompress(data, length):
+    return lz4.decompress(data, uncompressed_size=length)
+
+
+# Map from codec name to Codec
+CODECS = {
+    'zlib' : Codec('zlib', _zlib_compress, _zlib_decompress),
+    'shuffle-zlib' : Codec('shuffle-zlib', _zlib_compress, _zlib_decompress, shuffle=True),
+    'delta-shuffle-zlib' : Codec('delta-shuffle-zlib', _zlib_compress, _zlib_decompress, delta=True, shuffle=True)
+}
+
+if lz4 is not None:
+    CODECS['shuffle-lz4'] = Codec('shuffle-lz4', _lz4_compress, _lz4_decompress, shuffle=True)
+    CODECS['delta-shuffle-lz4'] = Codec('delta-shuffle-lz4', _lz4_compress, _lz4_decompress, delta=True, shuffle=True)
+
+
+class CompressionStats(object):
+    def __init__(self):
+        self.arrays = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self.cpu_seconds = 0.0 # see CPU_TIME_LABEL
+        self.wall_seconds = 0.0
+
+    def ratio(self):
+        if self.compressed_bytes == 0:
+            return 1.0
+
+        return float(self.raw_bytes) / self.compressed_bytes
+
+
+class ArrayCompressor(object):
+    """Compresses arrays chunk-by-chunk on a thread pool
+
+    Parameters
+    ----------
+    codec : str, optional
+        Name of a codec in `CODECS`
+    chunk_length : int, optional
+        Number of array elements per independently compressed chunk
+    threads : int, optional
+        Number of compression threads. Defaults to the number of CPUs.
+    """
+
+    def __init__(self, codec='shuffle-zlib', chunk_length=DEFAULT_CHUNK_LENGTH, threads=None):
+        self.codec = CODECS[codec]
+        self.chunk_length = chunk_length
+        self.pool = ThreadPool(threads if threads else cpu_count())
+        self.stats = CompressionStats()
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+    def reset_stats(self):
+        stats = self.stats
+        self.stats = CompressionStats()
+        return stats
+
+    def encode(self, array):
+        """Compress `array` into a self-describing payload
+
+        Parameters
+        ----------
+        array : numpy.ndarray or quantities.Quantity
+
+        Returns
+        -------
+        Payload as a `bytes` string
+
+        """
+
+        start = time.time()
+
+        values = np.ascontiguousarray(np.asarray(array)).ravel()
+        chunks = [values[i:i + self.chunk_length] for i in range(0, max(len(values), 1), self.chunk_length)]
+        if _thread_cpu_time is not None:
+            timed = self.pool.map(self._encode_chunk, chunks)
+            encoded = [data for (data, cpu_seconds) in timed]
+            cpu_seconds = sum(cpu_seconds for (data, cpu_seconds) in timed)
+        else:
+            start_cpu = _process_cpu_time()
+            encoded = self.pool.map(self.codec.encode, chunks)
+            cpu_seconds = _process_cpu_time() - start_cpu
+
+        header = {'codec': self.codec.name,
+                  'dtype': values.dtype.str,
+                  'shape': list(np.shape(array)),
+                  'chunk_length': self.chunk_length,
+                  'chunks': [len(data) for data in encoded]}
+        if isinstance(array, pq.Quantity):
+            header['units'] = array.dimensionality.string
+        for attr in ('labels', 'sampling_rates'):
+            if hasattr(array, attr):
+                header[attr] = [_jsonable(v) for v in getattr(array, attr)]
+
+        header = json.dumps(header).encode('utf-8')
+        payload = b''.join([MAGIC, struct.pack('<I', len(header)), header] + encoded)
+
+        self.stats.arrays += 1
+        self.stats.raw_bytes += values.nbytes
+        self.stats.compressed_bytes += len(payload)
+        self.stats.cpu_seconds += cpu_seconds
+        self.stats.wall_seconds += time.time() - start
+
+        return payload
+
+    def _encode_chunk(self, chunk):
+        """Compress `chunk`, returning the compressed bytes and the CPU seconds of this (worker) thread"""
+
+        start = _thread_cpu_time()
+        data = self.codec.encode(chunk)
+        return (data, _thread_cpu_time() - start)
+
+    def encode_data(self, data):
+        """Compress each array of a name => array Mapping for insertion with `ovation.data`
+
+        Returns
+        -------
+        dict of name => `quantities.Quantity` uint8 payload arrays
+
+        """
+
+        result = {}
+        for (name, array) in data.items():
+            payload = pq.Quantity(np.frombuffer(self.encode(array), dtype=np.uint8), pq.dimensionless)
+            payload.labels = [u'compressed byte']
+            payload.sampling_rates = [0 * pq.Hz]
+            result[name] = payload
+
+        return result
+
+    def report(self, file_path, stats=None):
+        if stats is None:
+            stats = self.stats
+
+        log_info("Compressed {} arrays from {} with {}: {:.1f} MB => {:.1f} MB (ratio {:.2f}, {:.1f} s {}, {:.1f} s wall)".format(
+            stats.arrays,
+            file_path,
+            self.codec.name,
+            stats.raw_bytes / 1024.0 ** 2,
+            stats.compressed_bytes / 1024.0 ** 2,
+            stats.ratio(),
+            stats.cpu_seconds,
+            CPU_TIME_LABEL,
+            stats.wall_seconds))
+
+
+def _process_cpu_time():
+    """User + system CPU seconds of this process (all threads)"""
+
+    times = os.times()
+    return times[0] + times[1]
+
+
+def _jsonable(value):
+    if isinstance(value, pq.Quantity):
+        return {'value': float(value.magnitude), 'units': value.dimensionality.string}
+
+    return value
+
+
+def _quantity(value):
+    if isinstance(value, dict):
+        return value['value'] * pq.Quantity(1, value['units'])
+
+    return value
+
+
+def decode(payload):
+    """Decode a payload produced by `ArrayCompressor.encode`
+
+    Parameters
+    ----------
+    payload : bytes or numpy.ndarray of uint8
+
+    Returns
+    -------
+    The original array, as a `quantities.Quantity` if units were recorded
+
+    """
+
+    if not isinstance(payload, bytes):
+        payload = _tobytes(np.ascontiguousarray(payload, dtype=np.uint8))
+    if payload[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a compressed ovation_neo payload")
+
+    offset = len(MAGIC)
+    (header_length,) = struct.unpack('<I', payload[offset:offset + 4])
+    offset += 4
+    header = json.loads(payload[offset:offset + header_length].decode('utf-8'))
+    offset += header_length
+
+    codec = CODECS[header['codec']]
+    dtype = np.dtype(str(header['dtype']))
+    size = int(np.prod(header['shape']))
+
+    values = np.empty(size, dtype=dtype)
+    for (i, chunk_size) in enumerate(header['chunks']):
+        start = i * header['chunk_length']
+        length = min(header['chunk_length'], size - start)
+        if length <= 0:
+            break
+        values[start:start + length] = codec.decode(payload[offset:offset + chunk_size], dtype, length)
+        offset += chunk_size
+
+    values = values.reshape(header['shape'])
+    if 'units' in header:
+        values = pq.Quantity(values, header['units'], copy=False)
+    for attr in ('labels', 'sampling_rates'):
+        if attr in header:
+            setattr(values, attr, [_quantity(v) for v in header[attr]])
+
+    return values
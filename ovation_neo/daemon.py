@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides a long-running import daemon that watches rig directories for new data files
+
+The daemon runs in a single process with one authenticated DataContext, so each import avoids the
+interpreter, Neo and Ovation client start-up and authentication of a fresh `python -m ovation_neo`.
+Directories are watched with inotify when the optional `pyinotify` package is available and polled
+otherwise. A file is queued once its size and modification time have not changed for the settle time,
+and queued files are imported in batches. Files that fail to import, or that another node is importing,
+are retried with exponential backoff until they are done.
+"""
+
+import json
+import os
+import os.path
+import time
+from collections import OrderedDict
+
+try:
+    import pyinotify
+except ImportError:
+    # pyinotify is optional (Linux only); fall back to polling
+    pyinotify = None
+
+from ovation_neo.importer import can_import, log_info, log_error
+
+__copyright__ = 'Copyright (c) 2013. Physion Consulting. All rights reserved.'
+
+
+class InotifyEvents(object):
+    """Collects paths changed in (recursively) watched directories"""
+
+    def __init__(self, directories):
+        self.changed = set()
+
+        changed = self.changed
+        class Handler(pyinotify.ProcessEvent):
+            def process_default(self, event):
+                changed.add(event.pathname)
+
+        manager = pyinotify.WatchManager()
+        mask = pyinotify.IN_CLOSE_WRITE | pyinotify.IN_MOVED_TO | pyinotify.IN_MODIFY | pyinotify.IN_CREATE
+        manager.add_watch(list(directories), mask, rec=True, auto_add=True)
+        self.notifier = pyinotify.Notifier(manager, Handler())
+
+    def wait(self, timeout):
+        """Wait up to `timeout` seconds for events
+
+        Returns
+        -------
+        Set of changed paths
+
+        """
+
+        if self.notifier.check_events(timeout * 1000):
+            self.notifier.read_events()
+            self.notifier.process_events()
+
+        changed = set(self.changed)
+        self.changed.clear()
+        return changed
+
+    def close(self):
+        self.notifier.stop()
+
+
+class ImportDaemon(object):
+    """Watches directories and imports completed data files in batches
+
+    Parameters
+    ----------
+    directories : sequence of str
+        Directories to watch (recursively)
+    import_fn : callable
+        Called with the path of each file to import. Returns `False` if the file was skipped because
+        another node holds its claim.
+    settle_time : float, optional
+        Seconds a file's size and modification time must be unchanged before it is queued
+    batch_interval : float, optional
+        Minimum seconds between import batches
+    poll_interval : float, optional
+        Seconds between directory scans (polling) or the maximum wait for inotify events
+    status_file : str, optional
+        If provided, a JSON status (queue depth, latencies, counts) is written to this path after each scan
+    is_done : callable, optional
+        Called with a file path; files for which it returns `True` are not imported (e.g.
+        `ovation_neo.shard.ClaimDirectory.is_done` to remember imported files across restarts). If
+        provided, a file is considered finished only once it returns `True`.
+    retry_interval : float, optional
+        Seconds before the first retry of a file that failed or was skipped. The interval doubles with each
+        further attempt, up to `max_retry_interval`.
+    max_retry_interval : float, optional
+    use_inotify : bool, optional
+        Use inotify if `pyinotify` is available
+    """
+
+    def __init__(self,
+                 directories,
+                 import_fn,
+                 settle_time=30,
+                 batch_interval=60,
+                 poll_interval=10,
+                 status_file=None,
+                 is_done=None,
+                 retry_interval=60,
+                 max_retry_interval=3600,
+                 use_inotify=True,
+                 clock=time.time,
+                 sleep=time.sleep):
+
+        self.directories = [os.path.abspath(d) for d in directories]
+        self.import_fn = import_fn
+        self.settle_time = settle_time
+        self.batch_interval = batch_interval
+        self.poll_interval = poll_interval
+        self.status_file = status_file
+        self.is_done = is_done
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self._clock = clock
+        self._sleep = sleep
+
+        self.candidates = {} # path => (signature, stable since, first seen)
+        self.queue = OrderedDict() # path => (signature, first seen)
+        self.retries = {} # path => (signature, first seen, retry time)
+        self.attempts = {} # path => unsuccessful import attempts
+        self.finished = {} # path => signature when imported
+
+        self.imported = 0
+        self.failed = 0
+        self.skipped = 0
+        self.last_batch = None
+        self._last_batch_time = None
+
+        if use_inotify and pyinotify is not None:
+            self.events = InotifyEvents(self.directories)
+            log_info("Watching {} with inotify".format(", ".join(self.directories)))
+        else:
+            self.events = None
+            log_info("Polling {} every {} s".format(", ".join(self.directories), poll_interval))
+
+    def mark_finished(self, paths):
+        """Record `paths` as already imported, so they are imported again only if they change"""
+
+        for path in paths:
+            path = os.path.abspath(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            self.finished[path] = (stat.st_size, stat.st_mtime)
+
+    def _files(self):
+        for directory in self.directories:
+            for (root, dirs, files) in os.walk(directory):
+                for name in files:
+                    path = os.path.join(root, name)
+                    if can_import(path):
+                        yield path
+
+    def scan(self, paths=None):
+        """Update the settle state of `paths` (or of all files in the watched directories) and queue settled files"""
+
+        now = self._clock()
+
+        if paths is None:
+            paths = set(self._files())
+        else:
+            paths = set(p for p in paths if can_import(p))
+        paths.update(self.candidates.keys())
+        paths.update(self.retries.keys())
+
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Removed or renamed
+                self.candidates.pop(path, None)
+                self.retries.pop(path, None)
+                self.attempts.pop(path, None)
+                continue
+
+            signature = (stat.st_size, stat.st_mtime)
+            if path in self.queue or self.finished.get(path) == signature:
+                continue
+
+            if path in self.retries:
+                (previous, first_seen, retry_time) = self.retries[path]
+                if previous != signature:
+                    # Changed since the last attempt; wait for it to settle again
+                    del self.retries[path]
+                    del self.attempts[path]
+                    self.candidates[path] = (signature, now, first_seen)
+                elif now >= retry_time:
+                    del self.retries[path]
+                    if self.is_done is not None and self.is_done(path):
+                        self.finished[path] = signature
+                    else:
+                        self.queue[path] = (signature, first_seen)
+                continue
+
+            if path in self.candidates:
+                (previous, since, first_seen) = self.candidates[path]
+                if previous != signature:
+                    self.candidates[path] = (signature, now, first_seen)
+                elif now - since >= self.settle_time:
+                    del self.candidates[path]
+                    if self.is_done is not None and self.is_done(path):
+                        self.finished[path] = signature
+                    else:
+                        self.queue[path] = (signature, first_seen)
+            else:
+                self.candidates[path] = (signature, now, now)
+
+        self.write_status()
+
+    def run_batch(self):
+        """Import all queued files"""
+
+        batch = list(self.queue.items())
+        self.queue.clear()
+        self._last_batch_time = self._clock()
+
+        latencies = []
+        skipped = 0
+        for (path, (signature, first_seen)) in batch:
+            done = False
+            try:
+                result = self.import_fn(path)
+            except Exception as e:
+                log_error("Unable to import {}: {}".format(path, e))
+                self.failed += 1
+            else:
+                if result is False:
+                    # Claimed by another node, which may stop before finishing it
+                    skipped += 1
+                    self.skipped += 1
+                else:
+                    self.imported += 1
+                    latencies.append(self._clock() - first_seen)
+                    done = True
+
+            if self.is_done is not None:
+                done = self.is_done(path)
+
+            if done:
+                self.finished[path] = signature
+                self.attempts.pop(path, None)
+            else:
+                self._retry(path, signature, first_seen)
+
+        self.last_batch = {'files': len(batch),
+                           'imported': len(latencies),
+                           'skipped': skipped,
+                           'finished': self._clock(),
+                           'mean_latency_s': sum(latencies) / len(latencies) if latencies else None,
+                           'max_latency_s': max(latencies) if latencies else None}
+
+        if latencies:
+            log_info("Imported {} of {} files ({} claimed by other nodes); latency mean {:.0f} s, max {:.0f} s; {} settling, {} waiting to retry".format(
+                len(latencies),
+                len(batch),
+                skipped,
+                self.last_batch['mean_latency_s'],
+                self.last_batch['max_latency_s'],
+                len(self.candidates),
+                len(self.retries)))
+
+        self.write_status()
+
+    def _retry(self, path, signature, first_seen):
+        attempts = self.attempts.get(path, 0) + 1
+        self.attempts[path] = attempts
+        delay = min(self.retry_interval * 2 ** (attempts - 1), self.max_retry_interval)
+        self.retries[path] = (signature, first_seen, self._clock() + delay)
+        log_info("Retrying {} in {:.0f} s".format(path, delay))
+
+    def batch_due(self):
+        return len(self.queue) > 0 and \
+               (self._last_batch_time is None or self._clock() - self._last_batch_time >= self.batch_interval)
+
+    def status(self):
+        now = self._clock()
+        return {'time': now,
+                'queue_depth': len(self.queue),
+                'settling': len(self.candidates),
+                'oldest_queued_s': max([now - first_seen for (signature, first_seen) in self.queue.values()] or [0]),
+                'retrying': len(self.retries),
+                'imported': self.imported,
+                'failed': self.failed,
+                'skipped': self.skipped,
+                'last_batch': self.last_batch}
+
+    def write_status(self):
+        if self.status_file is None:
+            return
+
+        tmp_path = self.status_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.status(), f, indent=2)
+        if os.name == 'nt' and os.path.exists(self.status_file):
+            os.remove(self.status_file)
+        os.rename(tmp_path, self.status_file)
+
+    def run(self):
+        """Watch and import until interrupted"""
+
+        self.scan()
+        try:
+            while True:
+                if self.events is not None:
+                    self.scan(self.events.wait(self.poll_interval))
+                else:
+                    self._sleep(self.poll_interval)
+                    self.scan()
+
+                if self.batch_due():
+                    self.run_batch()
+        except KeyboardInterrupt:
+            log_info("Stopping import daemon ({} files imported, {} queued)".format(self.imported, len(self.queue)))
+        finally:
+            if self.events is not None:
+                self.events.close()
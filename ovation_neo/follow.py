@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides incremental ("tail") import of Neo IO readable files that are still being recorded
+"""
+
+import json
+import os
+import os.path
+import time
+
+from ovation.conversion import asclass
+from ovation_neo.importer import read_blocks, insert_epoch_group, import_segment, wait_for_uploads, log_info, log_warning
+
+__copyright__ = 'Copyright (c) 2013. Physion Consulting. All rights reserved.'
+
+
+STATE_FILE_SUFFIX = '.ovation-follow'
+
+
+class FollowState(object):
+    """Progress of a followed file: the `EpochGroup` URI and number of imported segments for each block
+
+    State is persisted as JSON so that an interrupted follow can be resumed without re-importing segments.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.epoch_groups = []
+        self.segments = []
+        self.complete = False
+
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.epoch_groups = state['epoch_groups']
+            self.segments = state['segments']
+            self.complete = state.get('complete', False)
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'epoch_groups': self.epoch_groups,
+                       'segments': self.segments,
+                       'complete': self.complete}, f)
+
+        # Rename is atomic on POSIX, so a crash never leaves a truncated state file.
+        # On Windows, os.rename does not replace an existing file.
+        if os.name == 'nt' and os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(tmp_path, self.path)
+
+
+def follow_file(file_path,
+                epoch_group_container,
+                equipment_setup_root,
+                sources,
+                group_label=None,
+                protocol=None,
+                upload_throttle=None,
+                compressor=None,
+                overview_factors=None,
+                summary_statistics=False,
+                clip_ranges=None,
+                spike_bin_widths=None,
+                poll_interval=30,
+                idle_timeout=300,
+                state_path=None,
+                clock=time.time,
+                sleep=time.sleep):
+    """Import a Neo IO readable file incrementally while it is being written
+
+    Whenever the file changes, its structure is re-read lazily (without signal data). Only when a new
+    segment has been completed is the file read in full and the new segments imported into their block's
+    `EpochGroup`; the last segment of each block is held back because the recording may still be appending
+    to it. Once the file has not changed for `idle_timeout` seconds the recording is considered
+    finished and any remaining segments are imported.
+
+    Progress is stored in `state_path` (by default `file_path` + `.ovation-follow`) so that a restarted
+    follow continues into the same EpochGroup(s) from where it stopped.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to file to import
+    epoch_group_container : ovation.EpochGroup or ovation.Experiment
+        Container for the inserted `ovation.EpochGroup`
+    equipment_setup_root : str
+        Root path for equipment setup describing equipment that recorded the data to be imported
+    sources : iterable of us.physion.ovation.domain.Source
+        Experimental `Subjects` for data contained in file to be imported
+    group_label : string, optional
+    protocol : protocol
+    upload_throttle : ovation_neo.throttle.UploadThrottle, optional
+        Limits bandwidth and pending uploads of inserted data
+    compressor : ovation_neo.compression.ArrayCompressor, optional
+        Compresses inserted data
+    overview_factors : sequence of int, optional
+        If provided, store a min/max/mean overview of each analog signal at these decimation factors
+    summary_statistics : bool, optional
+        If `True`, store summary statistics of each analog signal as Measurement and Epoch properties
+    clip_ranges : sequence of quantities.Quantity, optional
+        Acquisition ranges used to compute the `clipping_fraction` summary statistic (see
+        `ovation_neo.summary.analog_signal_summary`)
+    spike_bin_widths : sequence of float, optional
+        If provided, store a spike sample index and spike counts binned at these widths (ms) for each spike train
+    poll_interval : float, optional
+        Seconds between checks for changes to `file_path`
+    idle_timeout : float, optional
+        Seconds without changes after which the recording is considered complete
+    state_path : str, optional
+        Path of the follow progress file
+
+    Returns
+    -------
+    List of `ovation.EpochGroups`, one for each `block` in input file
+
+    """
+
+    if state_path is None:
+        state_path = file_path + STATE_FILE_SUFFIX
+
+    state = FollowState(state_path)
+    data_context = epoch_group_container.getDataContext()
+    epoch_groups = [asclass("EpochGroup", data_context.getObjectWithURI(uri)) for uri in state.epoch_groups]
+
+    if state.complete:
+        log_info("{} has already been imported completely".format(file_path))
+        return epoch_groups
+
+    if compressor is not None:
+        compressor.reset_stats()
+
+    last_stat = None
+    last_change = clock()
+
+    while True:
+        stat = os.stat(file_path)
+        stat = (stat.st_size, stat.st_mtime)
+        if stat != last_stat:
+            last_stat = stat
+            last_change = clock()
+            complete = False
+        else:
+            complete = clock() - last_change >= idle_timeout
+            if not complete:
+                sleep(poll_interval)
+                continue
+
+        try:
+            # Reading the full file on every change would make total I/O grow quadratically with
+            # recording length, so check for newly completed segments with a lazy read first
+            if _has_new_segments(read_blocks(file_path, lazy=True), state, complete):
+                blocks = read_blocks(file_path)
+            else:
+                blocks = []
+        except Exception as e:
+            # Partially written records may not be readable yet
+            log_warning("Unable to read {} ({}). Retrying in {} s.".format(file_path, e, poll_interval))
+            sleep(poll_interval)
+            continue
+
+        imported = _import_new_segments(file_path,
+                                        blocks,
+                                        state,
+                                        epoch_groups,
+                                        epoch_group_container,
+                                        equipment_setup_root,
+                                        sources,
+                                        group_label=group_label,
+                                        protocol=protocol,
+                                        upload_throttle=upload_throttle,
+                                        compressor=compressor,
+                                        overview_factors=overview_factors,
+                                        summary_statistics=summary_statistics,
+                                        clip_ranges=clip_ranges,
+                                        spike_bin_widths=spike_bin_widths,
+                                        complete=complete)
+
+        if imported > 0:
+            wait_for_uploads(data_context.getFileService(), upload_throttle=upload_throttle)
+
+        if complete:
+            state.complete = True
+            state.save()
+            if compressor is not None:
+                compressor.report(file_path)
+            log_info("Finished following {}".format(file_path))
+            return epoch_groups
+
+        sleep(poll_interval)
+
+
+def _ready_segments(block, complete):
+    return len(block.segments) if complete else len(block.segments) - 1
+
+
+def _has_new_segments(blocks, state, complete):
+    for (i, block) in enumerate(blocks):
+        imported = state.segments[i] if i < len(state.segments) else 0
+        if _ready_segments(block, complete) > imported:
+            return True
+
+    return False
+
+
+def _import_new_segments(file_path,
+                         blocks,
+                         state,
+                         epoch_groups,
+                         epoch_group_container,
+                         equipment_setup_root,
+                         sources,
+                         group_label=None,
+                         protocol=None,
+                         upload_throttle=None,
+                         compressor=None,
+                         overview_factors=None,
+                         summary_statistics=False,
+                         clip_ranges=None,
+                         spike_bin_widths=None,
+                         complete=False):
+    imported = 0
+    for (i, block) in enumerate(blocks):
+        if i >= len(epoch_groups):
+            epoch_group = insert_epoch_group(epoch_group_container,
+                                             block,
+                                             protocol=protocol,
+                                             group_label=group_label,
+                                             file_mtime=os.path.getmtime(file_path))
+            epoch_groups.append(epoch_group)
+            state.epoch_groups.append(epoch_group.getURI().toString())
+            state.segments.append(0)
+            state.save()
+
+        for seg in block.segments[state.segments[i]:_ready_segments(block, complete)]:
+            log_info("Importing segment {} from {}".format(str(seg.index), file_path))
+            import_segment(epoch_groups[i],
+                           seg,
+                           sources,
+                           protocol=protocol,
+                           equipment_setup_root=equipment_setup_root,
+                           upload_throttle=upload_throttle,
+                           compressor=compressor,
+                           overview_factors=overview_factors,
+                           summary_statistics=summary_statistics,
+                           clip_ranges=clip_ranges,
+                           spike_bin_widths=spike_bin_widths)
+
+            state.segments[i] += 1
+            state.save()
+            imported += 1
+
+    return imported
@@ -73,6 +73,10 @@ from ovation import Maps, TimeUnit, DateTime
 from ovation.conversion import to_map, box_number, iterable, asclass
 from ovation.data import insert_numeric_measurement, insert_numeric_analysis_artifact
 
+from ovation_neo.overview import overview_data
+from ovation_neo.summary import analog_signal_summary
+from ovation_neo.spikes import spike_index_data
+
 # Map from file extension to importer
 __IMPORTERS = {
     '.plx' : nio.PlexonIO,
@@ -101,7 +105,13 @@ def import_file(file_path,
                 equipment_setup_root,
                 sources,
                 group_label=None,
-                protocol=None):
+                protocol=None,
+                upload_throttle=None,
+                compressor=None,
+                overview_factors=None,
+                summary_statistics=False,
+                clip_ranges=None,
+                spike_bin_widths=None):
     """Import a Neo IO readable file
 
     Parameters
@@ -118,6 +128,19 @@ def import_file(file_path,
         Experimental `Subjects` for data contained in file to be imported
     group_label : string, optional
     protocol : protocol
+    upload_throttle : ovation_neo.throttle.UploadThrottle, optional
+        Limits bandwidth and pending uploads of inserted data
+    compressor : ovation_neo.compression.ArrayCompressor, optional
+        Compresses inserted data. Compression statistics are reported for the file.
+    overview_factors : sequence of int, optional
+        If provided, store a min/max/mean overview of each analog signal at these decimation factors
+    summary_statistics : bool, optional
+        If `True`, store summary statistics of each analog signal as Measurement and Epoch properties
+    clip_ranges : sequence of quantities.Quantity, optional
+        Acquisition ranges used to compute the `clipping_fraction` summary statistic (see
+        `ovation_neo.summary.analog_signal_summary`)
+    spike_bin_widths : sequence of float, optional
+        If provided, store a spike sample index and spike counts binned at these widths (ms) for each spike train
 
     Returns
     -------
@@ -125,18 +148,46 @@ def import_file(file_path,
 
     """
 
+    if compressor is not None:
+        compressor.reset_stats()
+
+    epoch_groups = [import_block(epoch_group_container,
+                                 block,
+                                 equipment_setup_root,
+                                 sources,
+                                 protocol=protocol,
+                                 group_label=group_label,
+                                 file_mtime=os.path.getmtime(file_path),
+                                 upload_throttle=upload_throttle,
+                                 compressor=compressor,
+                                 overview_factors=overview_factors,
+                                 summary_statistics=summary_statistics,
+                                 clip_ranges=clip_ranges,
+                                 spike_bin_widths=spike_bin_widths) for block in read_blocks(file_path)]
+
+    if compressor is not None:
+        compressor.report(file_path)
+
+    return epoch_groups
+
+
+def read_blocks(file_path, lazy=False):
+    """Read all `neo.Block`s from a Neo IO readable file, choosing the reader by file extension
+
+    With `lazy=True`, only the structure (blocks, segments and headers) is read, not the signal data.
+    """
+
     ext = os.path.splitext(file_path)[-1]
 
     reader = __IMPORTERS[ext](filename=file_path)
-    #block = reader.read()
 
-    return [import_block(epoch_group_container,
-                        block,
-                        equipment_setup_root,
-                        sources,
-                        protocol=protocol,
-                        group_label=group_label,
-                        file_mtime=os.path.getmtime(file_path)) for block in reader.read()]
+    return reader.read(lazy=lazy)
+
+
+def can_import(file_path):
+    """`True` if there is a Neo IO reader for the extension of `file_path`"""
+
+    return os.path.splitext(file_path)[-1] in __IMPORTERS
 
 
 def import_block(epoch_group_container,
@@ -147,7 +198,13 @@ def import_block(epoch_group_container,
                  protocol_parameters={},
                  device_parameters={},
                  group_label=None,
-                 file_mtime=None):
+                 file_mtime=None,
+                 upload_throttle=None,
+                 compressor=None,
+                 overview_factors=None,
+                 summary_statistics=False,
+                 clip_ranges=None,
+                 spike_bin_widths=None):
     """Import a `Neo <http://neuralensemble.org/neo/>`_ `Block` as a single Ovation `EpochGroup`
 
 
@@ -170,7 +227,68 @@ def import_block(epoch_group_container,
     group_label : string, optional
         EpochGroup label. If `None`, and `block.name` is not `None`, `block.name` will be used
         for the EpochGroup label.
+    upload_throttle : ovation_neo.throttle.UploadThrottle, optional
+        Limits bandwidth and pending uploads of inserted data
+    compressor : ovation_neo.compression.ArrayCompressor, optional
+        Compresses inserted data
+    overview_factors : sequence of int, optional
+        If provided, store a min/max/mean overview of each analog signal at these decimation factors
+    summary_statistics : bool, optional
+        If `True`, store summary statistics of each analog signal as Measurement and Epoch properties
+    clip_ranges : sequence of quantities.Quantity, optional
+        Acquisition ranges used to compute the `clipping_fraction` summary statistic (see
+        `ovation_neo.summary.analog_signal_summary`)
+    spike_bin_widths : sequence of float, optional
+        If provided, store a spike sample index and spike counts binned at these widths (ms) for each spike train
+
+
+    Returns
+    -------
+    The inserted `ovation.EpochGroup`
+
+    """
+
+    epochGroup = insert_epoch_group(epoch_group_container,
+                                    block,
+                                    protocol=protocol,
+                                    protocol_parameters=protocol_parameters,
+                                    device_parameters=device_parameters,
+                                    group_label=group_label,
+                                    file_mtime=file_mtime)
 
+    if len(block.recordingchannelgroups) > 0:
+        log_warning("Block contains RecordingChannelGroups. Import of RecordingChannelGroups is currently not supported.")
+
+    log_info("Importing segments from {}".format(block.file_origin))
+    for seg in block.segments:
+        log_info("Importing segment {} from {}".format(str(seg.index), block.file_origin))
+        import_segment(epochGroup,
+                       seg,
+                       sources,
+                       protocol=protocol,
+                       equipment_setup_root=equipment_setup_root,
+                       upload_throttle=upload_throttle,
+                       compressor=compressor,
+                       overview_factors=overview_factors,
+                       summary_statistics=summary_statistics,
+                       clip_ranges=clip_ranges,
+                       spike_bin_widths=spike_bin_widths)
+
+    wait_for_uploads(epoch_group_container.getDataContext().getFileService(), upload_throttle=upload_throttle)
+
+    return epochGroup
+
+
+def insert_epoch_group(epoch_group_container,
+                       block,
+                       protocol=None,
+                       protocol_parameters={},
+                       device_parameters={},
+                       group_label=None,
+                       file_mtime=None):
+    """Insert an empty Ovation `EpochGroup` for a `neo.Block`
+
+    See `import_block` for parameters.
 
     Returns
     -------
@@ -203,24 +321,18 @@ def import_block(epoch_group_container,
                                                         to_map(device_parameters)
     )
 
-    if len(block.recordingchannelgroups) > 0:
-        log_warning("Block contains RecordingChannelGroups. Import of RecordingChannelGroups is currently not supported.")
+    return epochGroup
 
-    log_info("Importing segments from {}".format(block.file_origin))
-    for seg in block.segments:
-        log_info("Importing segment {} from {}".format(str(seg.index), block.file_origin))
-        import_segment(epochGroup,
-                       seg,
-                       sources,
-                       protocol=protocol,
-                       equipment_setup_root=equipment_setup_root)
+
+def wait_for_uploads(file_service, upload_throttle=None):
+    """Block until `file_service` has no pending uploads"""
 
     log_info("Waiting for uploads to complete...")
-    fs = epoch_group_container.getDataContext().getFileService()
-    while(fs.hasPendingUploads()):
-        fs.waitForPendingUploads(10, TimeUnit.SECONDS)
+    while(file_service.hasPendingUploads()):
+        file_service.waitForPendingUploads(10, TimeUnit.SECONDS)
 
-    return epochGroup
+    if upload_throttle is not None:
+        upload_throttle.report()
 
 NEO_PROTOCOL = "neo.io empty protocol"
 NEO_PROTOCOL_TEXT = """Data imported via neo.io with no additional protocol provided."""
@@ -289,13 +401,40 @@ def import_timeline_annotations(epoch, segment, start_time):
                                         epoch_end)
 
 
-def import_spiketrains(epoch, protocol, segment):
+def throttle_upload(entity, data, upload_throttle):
+    """Block until `upload_throttle` admits the upload of `data` (a name => array Mapping)"""
+
+    if upload_throttle is not None:
+        upload_throttle.acquire(entity.getDataContext().getFileService(),
+                                sum(arr.nbytes for arr in data.values()))
+
+
+def encode_data(data, compressor):
+    """Compress the arrays in `data` (a name => array Mapping) with `compressor`, if provided"""
+
+    if compressor is None:
+        return data
+
+    return compressor.encode_data(data)
+
+
+def record_codec(entity, compressor):
+    """Record the codec used for `entity`'s data elements as properties of `entity`"""
+
+    if compressor is not None:
+        entity.addProperty('codec', compressor.codec.name)
+        entity.addProperty('codec.chunk_length', box_number(compressor.chunk_length))
+
+
+def import_spiketrains(epoch, protocol, segment, upload_throttle=None, compressor=None, bin_widths=None):
     for (i, spike_train) in enumerate(segment.spiketrains):
         params = {'t_start_ms': spike_train.t_start.rescale(pq.ms).item(),
                   't_stop_ms': spike_train.t_stop.rescale(pq.ms).item(),
                   'sampling_rate_hz': spike_train.sampling_rate.rescale(pq.Hz).item(),
                   'description': spike_train.description,
                   'file_origin': spike_train.file_origin}
+        if bin_widths is not None:
+            params['spike_bin_widths_ms'] = ','.join('{:g}'.format(w) for w in bin_widths)
 
         if spike_train.name:
             name = spike_train.name
@@ -318,17 +457,36 @@ def import_spiketrains(epoch, protocol, segment):
         spike_train.waveforms.labels = ['channel index', 'time', 'spike']
         spike_train.waveforms.sampling_rates = [0, spike_train.sampling_rate, 0] * pq.Hz
 
+        data = encode_data({'spike times': spike_train,
+                            'spike waveforms': spike_train.waveforms},
+                           compressor)
+        throttle_upload(epoch, data, upload_throttle)
         insert_numeric_analysis_artifact(ar,
                                          name,
-                                         {'spike times': spike_train,
-                                          'spike waveforms': spike_train.waveforms})
+                                         data)
+        record_codec(ar, compressor)
+
+        if bin_widths is not None:
+            # Stored as separate artifacts so rate queries need not download the spike data
+            for (suffix, index) in spike_index_data(spike_train, bin_widths_ms=bin_widths):
+                index = encode_data(index, compressor)
+                throttle_upload(epoch, index, upload_throttle)
+                insert_numeric_analysis_artifact(ar,
+                                                 "{} {}".format(name, suffix),
+                                                 index)
 
 
 def import_segment(epoch_group,
                    segment,
                    sources,
                    protocol=None,
-                   equipment_setup_root=None):
+                   equipment_setup_root=None,
+                   upload_throttle=None,
+                   compressor=None,
+                   overview_factors=None,
+                   summary_statistics=False,
+                   clip_ranges=None,
+                   spike_bin_widths=None):
 
 
     ctx = epoch_group.getDataContext()
@@ -366,14 +524,35 @@ def import_segment(epoch_group,
 
 
     for analog_signal in segment.analogsignals:
-        import_analog_signal(epoch, analog_signal, equipment_setup_root)
+        measurement = import_analog_signal(epoch,
+                                           analog_signal,
+                                           equipment_setup_root,
+                                           upload_throttle=upload_throttle,
+                                           compressor=compressor)
+
+        if summary_statistics:
+            record_summary_statistics(epoch, measurement, analog_signal, clip_ranges=clip_ranges)
+
+        if overview_factors is not None:
+            import_overview(epoch,
+                            protocol,
+                            measurement,
+                            analog_signal,
+                            overview_factors,
+                            upload_throttle=upload_throttle,
+                            compressor=compressor)
 
     import_timeline_annotations(epoch, segment, start_time)
 
     if len(segment.spikes) > 0:
         logging.warning("Segment contains Spikes. Import of individual Spike data is not yet implemented (but SpikeTrains are).")
 
-    import_spiketrains(epoch, protocol, segment)
+    import_spiketrains(epoch,
+                       protocol,
+                       segment,
+                       upload_throttle=upload_throttle,
+                       compressor=compressor,
+                       bin_widths=spike_bin_widths)
 
 
 
@@ -391,7 +570,7 @@ def import_analog_signal_array(epoch, signal_array, equipment_setup_root):
                                { signal_array.name : signal_array })
 
 
-def import_analog_signal(epoch, analog_signal, equipment_setup_root):
+def import_analog_signal(epoch, analog_signal, equipment_setup_root, upload_throttle=None, compressor=None):
 
     analog_signal.labels = [u'time']
     analog_signal.sampling_rates = [analog_signal.sampling_rate]
@@ -409,13 +588,86 @@ def import_analog_signal(epoch, analog_signal, equipment_setup_root):
         log_warning("Analog signal does not have a name. Using '{}' as measurement and data name.".format(name))
 
     device = '{}.channels.{}'.format(equipment_setup_root, channel_index)
-    insert_numeric_measurement(epoch,
-                               set(iterable(epoch.getInputSources().keySet())),
-                               {device},
-                               name,
-                               {name : analog_signal})
+    data = encode_data({name : analog_signal}, compressor)
+    throttle_upload(epoch, data, upload_throttle)
+    measurement = insert_numeric_measurement(epoch,
+                                             set(iterable(epoch.getInputSources().keySet())),
+                                             {device},
+                                             name,
+                                             data)
+    record_codec(measurement, compressor)
 
+    return measurement
 
 
+def record_summary_statistics(epoch, measurement, analog_signal, clip_ranges=None):
+    """Store summary statistics of `analog_signal` as properties of `measurement` and `epoch`
 
+    Measurement properties are named by statistic (e.g. `rms`); Epoch properties are prefixed by the
+    measurement name (e.g. `Channel 1.rms`) so that a single Epoch query can cover all channels.
+    See `ovation_neo.summary.signal_summary` for the statistics.
+    """
+
+    summary = analog_signal_summary(analog_signal, clip_ranges=clip_ranges)
+    units = summary.pop('units')
+
+    properties = dict((k, box_number(v)) for (k, v) in summary.items())
+    properties['units'] = units
+
+    for (k, v) in properties.items():
+        measurement.addProperty(k, v)
+        epoch.addProperty('{}.{}'.format(measurement.getName(), k), v)
+
+
+def import_overview(epoch,
+                    protocol,
+                    measurement,
+                    analog_signal,
+                    factors,
+                    upload_throttle=None,
+                    compressor=None):
+    """Store a multi-resolution min/max/mean overview of `analog_signal` as an AnalysisRecord of `measurement`
+
+    Each level is a separate `<measurement> overview <factor>x` artifact, so viewers download only the level
+    they draw. The artifact name of each level is recorded in the `level.<factor>x` parameter.
+
+    Parameters
+    ----------
+    epoch : ovation.Epoch
+    protocol : ovation.Protocol
+    measurement : ovation.Measurement
+        Measurement containing `analog_signal`
+    analog_signal : neo.AnalogSignal
+    factors : sequence of int
+        Increasing decimation factors, each a multiple of the previous one
+
+    Returns
+    -------
+    The inserted `ovation.AnalysisRecord`
+
+    """
+
+    name = "{} overview".format(measurement.getName())
+    params = {'decimation_factors': ','.join(str(f) for f in factors),
+              'sampling_rate_hz': analog_signal.sampling_rate.rescale(pq.Hz).item(),
+              'measurement': measurement.getName()}
+    for f in factors:
+        params['level.{}x'.format(f)] = "{} {}x".format(name, f)
+
+    inputs = Maps.newHashMap()
+    inputs.put(measurement.getName(), measurement)
+
+    ar = epoch.addAnalysisRecord(name,
+                                 inputs,
+                                 protocol,
+                                 to_map(params))
+
+    for (factor, level) in overview_data(analog_signal, factors=factors):
+        data = encode_data(level, compressor)
+        throttle_upload(epoch, data, upload_throttle)
+        insert_numeric_analysis_artifact(ar,
+                                         params['level.{}x'.format(factor)],
+                                         data)
+    record_codec(ar, compressor)
 
+    return ar
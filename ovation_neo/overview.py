@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides multi-resolution min/max/mean overviews ("pyramids") of long signals
+
+An overview lets viewers draw and seek a long recording without downloading the full signal. Level
+`k` summarises each run of `factors[k]` consecutive samples by its minimum, maximum and mean.
+"""
+
+import numpy as np
+import quantities as pq
+
+__copyright__ = 'Copyright (c) 2013. Physion Consulting. All rights reserved.'
+
+
+DEFAULT_FACTORS = (64, 512, 4096, 32768)
+BLOCK_LENGTH = 2 ** 20 # samples per streaming block
+
+
+def parse_factors(factors):
+    """Parse a comma-separated list of decimation factors such as `64,512,4096`"""
+
+    factors = [int(f) for f in str(factors).split(',') if f.strip()]
+    check_factors(factors)
+
+    return factors
+
+
+def check_factors(factors):
+    if len(factors) == 0:
+        raise ValueError("At least one decimation factor is required")
+
+    previous = 1
+    for f in factors:
+        if f <= previous or f % previous != 0:
+            raise ValueError("Decimation factors must be increasing multiples of each other (got {})".format(factors))
+        previous = f
+
+
+def _reduce(mins, maxs, sums, counts, factor):
+    starts = np.arange(0, len(mins), factor)
+    return (np.minimum.reduceat(mins, starts),
+            np.maximum.reduceat(maxs, starts),
+            np.add.reduceat(sums, starts),
+            np.add.reduceat(counts, starts))
+
+
+def minmax_pyramid(signal, factors=DEFAULT_FACTORS, block_length=BLOCK_LENGTH):
+    """Compute min/max/mean overviews of a 1-D signal at several decimation factors
+
+    The signal is read once, in blocks of (about) `block_length` samples, so memory-mapped or lazily
+    loaded signals are never copied in full. Coarser levels are computed from the finest level.
+
+    Parameters
+    ----------
+    signal : array-like
+        1-D signal
+    factors : sequence of int, optional
+        Increasing decimation factors, each a multiple of the previous one
+    block_length : int, optional
+        Approximate number of samples processed per vectorized block
+
+    Returns
+    -------
+    List of `(factor, min, max, mean)` tuples of `numpy.ndarray`, one per factor. The final bin of each
+    level summarises the remaining (fewer than `factor`) samples.
+
+    """
+
+    check_factors(factors)
+
+    base = factors[0]
+    block_length = max(base, block_length - block_length % base)
+
+    mins = []
+    maxs = []
+    sums = []
+    counts = []
+    for start in range(0, len(signal), block_length):
+        block = np.asarray(signal[start:start + block_length]).ravel()
+        starts = np.arange(0, len(block), base)
+        mins.append(np.minimum.reduceat(block, starts))
+        maxs.append(np.maximum.reduceat(block, starts))
+        sums.append(np.add.reduceat(block, starts, dtype=np.float64))
+        counts.append(np.diff(np.append(starts, len(block))))
+
+    if len(mins) == 0:
+        empty = np.array([], dtype=np.float64)
+        return [(f, empty, empty, empty) for f in factors]
+
+    level = (np.concatenate(mins), np.concatenate(maxs), np.concatenate(sums), np.concatenate(counts))
+
+    pyramid = []
+    previous = base
+    for f in factors:
+        if f != previous:
+            level = _reduce(level[0], level[1], level[2], level[3], f // previous)
+            previous = f
+
+        (level_min, level_max, level_sum, level_count) = level
+        pyramid.append((f, level_min, level_max, level_sum / level_count))
+
+    return pyramid
+
+
+def overview_data(signal, factors=DEFAULT_FACTORS, block_length=BLOCK_LENGTH):
+    """Compute the overview pyramid of a `neo.AnalogSignal` as one name => array Mapping per level for `ovation.data`
+
+    Each level is stored as a separate artifact, so a viewer downloads only the level it draws.
+
+    Returns
+    -------
+    List of `(factor, data)` tuples, one per factor, where `data` is a dict with `min`, `max` and `mean`
+    `quantities.Quantity` arrays
+
+    """
+
+    if isinstance(signal, pq.Quantity):
+        units = signal.units
+        values = signal.magnitude
+    else:
+        units = pq.dimensionless
+        values = signal
+
+    sampling_rate = getattr(signal, 'sampling_rate', None)
+
+    levels = []
+    for (factor, level_min, level_max, level_mean) in minmax_pyramid(values, factors=factors, block_length=block_length):
+        data = {}
+        for (stat, level) in (('min', level_min), ('max', level_max), ('mean', level_mean)):
+            arr = pq.Quantity(level, units)
+            arr.labels = [u'time']
+            arr.sampling_rates = [sampling_rate / factor if sampling_rate is not None else 0 * pq.Hz]
+            data[stat] = arr
+        levels.append((factor, data))
+
+    return levels
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides deterministic sharding of import file lists and file claims in a shared lock directory
+
+Several import nodes given the same file list can each import a disjoint shard (`shard_files`), and/or
+coordinate through claim files in a directory on a shared filesystem (`ClaimDirectory`) so that no file is
+imported twice. Claims of nodes that die are considered stale, and may be taken over, once they have not been
+refreshed for the claim timeout.
+"""
+
+import hashlib
+import json
+import os
+import os.path
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from ovation_neo.importer import log_info, log_warning, log_error
+
+__copyright__ = 'Copyright (c) 2013. Physion Consulting. All rights reserved.'
+
+
+SHARD_STRATEGIES = ('hash', 'size')
+
+
+def parse_shard(shard):
+    """Parse a shard specification `i/N` (0 <= i < N)
+
+    Returns
+    -------
+    Tuple `(i, N)`
+
+    """
+
+    try:
+        (index, count) = [int(v) for v in str(shard).split('/')]
+    except ValueError:
+        raise ValueError("Shard must be of the form i/N (got '{}')".format(shard))
+
+    if count < 1 or not (0 <= index < count):
+        raise ValueError("Shard index must satisfy 0 <= i < N (got '{}')".format(shard))
+
+    return (index, count)
+
+
+def _path_bytes(file_path):
+    """`file_path` as bytes in the filesystem encoding"""
+
+    if isinstance(file_path, bytes):
+        # Python 2 str paths may contain non-ASCII bytes in any encoding; use them as they are
+        return file_path
+
+    if hasattr(os, 'fsencode'):
+        return os.fsencode(file_path)
+
+    return file_path.encode(sys.getfilesystemencoding() or 'utf-8')
+
+
+def file_key(file_path):
+    """Stable identifier of `file_path` shared by all nodes given the same file list"""
+
+    return hashlib.md5(_path_bytes(os.path.normpath(file_path))).hexdigest()
+
+
+def shard_files(files, index, count, strategy='hash'):
+    """Select the files of shard `index` of `count`
+
+    All nodes must be given the same file list (as the same paths).
+
+    Parameters
+    ----------
+    files : sequence of str
+    index : int
+    count : int
+    strategy : str, optional
+        `hash` assigns each file by a hash of its path. `size` balances the total bytes per shard by
+        assigning files, largest first, to the shard with the fewest bytes.
+
+    Returns
+    -------
+    List of the files in shard `index`, in input order
+
+    """
+
+    if strategy == 'hash':
+        selected = set(f for f in files if int(file_key(f), 16) % count == index)
+    elif strategy == 'size':
+        loads = [0] * count
+        selected = set()
+        for (size, f) in sorted(((os.path.getsize(f), f) for f in set(files)), key=lambda sf: (-sf[0], sf[1])):
+            shard = loads.index(min(loads))
+            loads[shard] += size
+            if shard == index:
+                selected.add(f)
+    else:
+        raise ValueError("Unknown shard strategy '{}'".format(strategy))
+
+    return [f for f in files if f in selected]
+
+
+class ClaimDirectory(object):
+    """File claims in a directory shared by all import nodes
+
+    A claim is a `<key>.claim` file created atomically with `O_CREAT | O_EXCL`. Imported files are
+    marked by a `<key>.done` file and are never claimed again. Nodes break stale claims one at a time
+    while holding a `<key>.claim.break` file, also created with `O_CREAT | O_EXCL`.
+
+    Parameters
+    ----------
+    path : str
+        Lock directory (created if necessary)
+    timeout : float, optional
+        Seconds after which a claim that has not been refreshed is considered stale
+    node : str, optional
+        Identifier of this node, recorded in its claims. Defaults to `hostname:pid`.
+    root : str, optional
+        Files are identified by their absolute path, or by their path relative to `root` if given, so that
+        nodes that mount the shared data at different paths agree
+    """
+
+    def __init__(self, path, timeout=3600, node=None, root=None):
+        self.path = path
+        self.timeout = timeout
+        self.node = node if node is not None else "{}:{}".format(socket.gethostname(), os.getpid())
+        self.root = os.path.abspath(root) if root is not None else None
+
+        if not os.path.isdir(path):
+            try:
+                os.makedirs(path)
+            except OSError:
+                # Another node created it first
+                if not os.path.isdir(path):
+                    raise
+
+    def _path(self, file_path, suffix):
+        # Claims must not depend on how a path was typed (e.g. relative to the working directory)
+        path = os.path.abspath(file_path)
+        if self.root is not None:
+            path = os.path.relpath(path, self.root)
+
+        return os.path.join(self.path, file_key(path) + suffix)
+
+    def is_done(self, file_path):
+        return os.path.exists(self._path(file_path, '.done'))
+
+    def _write(self, fd, file_path):
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'file': _path_bytes(file_path).decode('utf-8', 'replace'),
+                       'node': self.node,
+                       'time': time.time()}, f)
+
+    def claim(self, file_path):
+        """Try to claim `file_path` for this node
+
+        Returns
+        -------
+        `True` if the claim succeeded, `False` if the file is done or claimed by a live node
+
+        """
+
+        if self.is_done(file_path):
+            return False
+
+        claim_path = self._path(file_path, '.claim')
+        for attempt in range(2):
+            try:
+                fd = os.open(claim_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except OSError:
+                if attempt > 0 or not self._break_stale(claim_path):
+                    return False
+            else:
+                self._write(fd, file_path)
+                # A node may have finished the file between our is_done check and claim
+                if self.is_done(file_path):
+                    os.remove(claim_path)
+                    return False
+                return True
+
+        return False
+
+    @staticmethod
+    def _age(path):
+        """Seconds since `path` was modified, or `None` if it does not exist"""
+
+        try:
+            return time.time() - os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def _owner(self, claim_path):
+        """Node recorded in the claim at `claim_path`, or `None` if it does not exist"""
+
+        try:
+            with open(claim_path) as f:
+                return json.load(f).get('node')
+        except (IOError, OSError, ValueError):
+            # Missing, or being written by the claiming node
+            return None
+
+    def _break_stale(self, claim_path):
+        """Remove the claim at `claim_path` if it is stale
+
+        Returns
+        -------
+        `True` if the claim no longer exists
+
+        """
+
+        age = self._age(claim_path)
+        if age is None:
+            # Released in the meantime
+            return True
+
+        if age < self.timeout:
+            return False
+
+        # Only the node holding the break lock may remove the claim. Checking the claim's age again
+        # while holding it ensures a claim that another node has broken and re-claimed since our check
+        # is never removed.
+        break_path = claim_path + '.break'
+        try:
+            fd = os.open(break_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError:
+            # Another node is breaking the claim. The break lock is held only briefly, so an old one was
+            # left by a node that stopped while breaking.
+            break_age = self._age(break_path)
+            if break_age is not None and break_age >= self.timeout:
+                log_warning("Removing abandoned break lock {}".format(break_path))
+                try:
+                    os.remove(break_path)
+                except OSError:
+                    pass
+            return False
+
+        try:
+            os.close(fd)
+
+            age = self._age(claim_path)
+            if age is None:
+                return True
+
+            if age < self.timeout:
+                return False
+
+            log_warning("Releasing stale claim {} ({:.0f} s old)".format(claim_path, age))
+            os.remove(claim_path)
+            return True
+        finally:
+            os.remove(break_path)
+
+    def refresh(self, file_path):
+        """Mark this node's claim of `file_path` as live
+
+        Returns
+        -------
+        `False` if this node no longer holds the claim (it was broken as stale by another node)
+
+        """
+
+        claim_path = self._path(file_path, '.claim')
+        if self._owner(claim_path) != self.node:
+            return False
+
+        os.utime(claim_path, None)
+        return True
+
+    def release(self, file_path, done=True):
+        """Release the claim of `file_path`, marking it as imported if `done`"""
+
+        if done:
+            fd = os.open(self._path(file_path, '.done'), os.O_CREAT | os.O_WRONLY | os.O_TRUNC)
+            self._write(fd, file_path)
+
+        claim_path = self._path(file_path, '.claim')
+        if self._owner(claim_path) != self.node:
+            # Never remove a claim another node took over after ours was broken
+            log_warning("Claim of {} was already released".format(file_path))
+            return
+
+        os.remove(claim_path)
+
+    @contextmanager
+    def hold(self, file_path):
+        """Claim `file_path` for the duration of a `with` block
+
+        Yields `True` if this node holds the claim. While held, the claim is refreshed in the background.
+        The file is marked done if the block completes and released for other nodes if it raises.
+        """
+
+        if not self.claim(file_path):
+            log_info("Skipping {} (imported or claimed by another node)".format(file_path))
+            yield False
+            return
+
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(self.timeout / 3.0):
+                try:
+                    if not self.refresh(file_path):
+                        log_error("Claim of {} was broken by another node, which may import it again".format(file_path))
+                        return
+                except OSError as e:
+                    log_warning("Unable to refresh claim of {} ({})".format(file_path, e))
+
+        thread = threading.Thread(target=heartbeat)
+        thread.daemon = True
+        thread.start()
+
+        try:
+            yield True
+        except:
+            stop.set()
+            self.release(file_path, done=False)
+            raise
+        else:
+            stop.set()
+            self.release(file_path, done=True)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides precomputed spike-time indices and binned spike counts of spike trains
+
+The sorted integer sample index of each spike supports time-window lookups by binary search
+(`numpy.searchsorted`), and binned counts support rate/PSTH queries without the full spike data.
+"""
+
+import numpy as np
+import quantities as pq
+
+__copyright__ = 'Copyright (c) 2013. Physion Consulting. All rights reserved.'
+
+
+# Dense counts of fine bins are much larger than the spike times of a typical (sparse) spike train
+DEFAULT_BIN_WIDTHS_MS = (10, 100, 1000)
+
+
+def parse_bin_widths(widths):
+    """Parse a comma-separated list of bin widths in milliseconds such as `10,100,1000`"""
+
+    widths = [float(w) for w in str(widths).split(',') if w.strip()]
+    if len(widths) == 0 or min(widths) <= 0:
+        raise ValueError("Bin widths must be positive (got {})".format(widths))
+
+    return widths
+
+
+def spike_sample_index(spike_train):
+    """Sorted spike times of `spike_train` as integer sample indices relative to `t_start`
+
+    Returns
+    -------
+    `numpy.ndarray` of int64
+
+    """
+
+    times = (spike_train.times - spike_train.t_start).rescale(pq.s).magnitude
+    rate = spike_train.sampling_rate.rescale(pq.Hz).item()
+
+    return np.sort(np.round(np.asarray(times, dtype=np.float64).ravel() * rate).astype(np.int64))
+
+
+def binned_counts(spike_train, bin_width):
+    """Number of spikes of `spike_train` in consecutive bins of `bin_width` from `t_start` to `t_stop`
+
+    The final bin may extend past `t_stop`; a spike at exactly `t_stop` is counted in the final bin. If
+    `bin_width` is a whole number of samples, spikes are binned by their `spike_sample_index` so that bin
+    edges are exact.
+
+    Parameters
+    ----------
+    spike_train : neo.SpikeTrain
+    bin_width : quantities.Quantity
+        Bin width (time)
+
+    Returns
+    -------
+    `numpy.ndarray` of the narrowest unsigned integer type that holds the largest count
+
+    """
+
+    width = bin_width.rescale(pq.s).item()
+    duration = (spike_train.t_stop - spike_train.t_start).rescale(pq.s).item()
+    n_bins = max(int(np.ceil(duration / width - 1e-9)), 1)
+
+    samples_per_bin = width * spike_train.sampling_rate.rescale(pq.Hz).item()
+    if samples_per_bin >= 1 and abs(samples_per_bin - round(samples_per_bin)) < 1e-6:
+        bins = spike_sample_index(spike_train) // int(round(samples_per_bin))
+    else:
+        times = np.asarray((spike_train.times - spike_train.t_start).rescale(pq.s).magnitude, dtype=np.float64).ravel()
+        bins = np.floor(times / width).astype(np.int64)
+
+    bins = np.clip(bins, 0, n_bins - 1)
+
+    counts = np.bincount(bins, minlength=n_bins)
+
+    return counts.astype(np.min_scalar_type(counts.max() if len(counts) > 0 else 0))
+
+
+def spike_index_data(spike_train, bin_widths_ms=DEFAULT_BIN_WIDTHS_MS):
+    """Spike sample index and binned counts of `spike_train` as name => array Mappings for `ovation.data`
+
+    The index and the counts of each bin width are separate artifacts, so a query downloads only the
+    data it needs.
+
+    Returns
+    -------
+    List of `(artifact suffix, data)` tuples: `('index', {'spike sample index': ...})` followed by
+    `('counts {width} ms', {'spike counts': ...})` for each bin width, with `quantities.Quantity` arrays
+
+    """
+
+    index = pq.Quantity(spike_sample_index(spike_train), pq.dimensionless)
+    index.labels = [u'spike']
+    index.sampling_rates = [0 * pq.Hz]
+
+    artifacts = [('index', {'spike sample index': index})]
+    for width in bin_widths_ms:
+        counts = pq.Quantity(binned_counts(spike_train, width * pq.ms), pq.dimensionless, copy=False)
+        counts.labels = [u'time']
+        counts.sampling_rates = [(1.0 / (width * pq.ms)).rescale(pq.Hz)]
+        artifacts.append(('counts {:g} ms'.format(width), {'spike counts': counts}))
+
+    return artifacts
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides per-channel summary statistics of analog signals for quality control queries
+"""
+
+import re
+
+import numpy as np
+import quantities as pq
+
+__copyright__ = 'Copyright (c) 2013. Physion Consulting. All rights reserved.'
+
+
+BLOCK_LENGTH = 2 ** 20 # samples per block
+
+# median(|N(0, s^2)|) = 0.6745 s
+MAD_TO_SD = 1 / 0.6745
+
+# Minimum number of consecutive samples at the signal's extreme value counted by `extreme_fraction`
+EXTREME_RUN_LENGTH = 3
+
+
+def parse_clip_range(clip_range):
+    """Parse an acquisition range such as `-10,10V` or `-200,200 mV`
+
+    Returns
+    -------
+    `quantities.Quantity` array `[low, high]`
+
+    """
+
+    match = re.match(r'^\s*([-+]?[0-9.]+(?:e[-+]?[0-9]+)?)\s*,\s*([-+]?[0-9.]+(?:e[-+]?[0-9]+)?)\s*([A-Za-z]+)\s*$',
+                     str(clip_range),
+                     re.IGNORECASE)
+    if match is None:
+        raise ValueError("Clip range must be of the form LOW,HIGH<units> (got '{}')".format(clip_range))
+
+    (low, high) = (float(match.group(1)), float(match.group(2)))
+    if low >= high:
+        raise ValueError("Clip range low must be less than high (got '{}')".format(clip_range))
+
+    try:
+        units = pq.Quantity(1, match.group(3))
+    except (LookupError, ValueError):
+        raise ValueError("Unknown units '{}' in clip range".format(match.group(3)))
+
+    return pq.Quantity([low, high], units.units)
+
+
+def _samples_in_runs(mask, run_length):
+    """Number of `True` values of `mask` in runs of at least `run_length` consecutive `True` values"""
+
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    lengths = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+    return int(lengths[lengths >= run_length].sum())
+
+
+def signal_summary(signal, block_length=BLOCK_LENGTH, clip_range=None, extreme_run_length=EXTREME_RUN_LENGTH):
+    """Compute summary statistics of a 1-D signal in a single blockwise pass
+
+    Parameters
+    ----------
+    signal : array-like
+        1-D signal (may be memory-mapped; it is read in blocks of `block_length` samples)
+    block_length : int, optional
+    clip_range : (float, float), optional
+        Acquisition (amplifier or digitizer) range `(low, high)` in signal units
+    extreme_run_length : int, optional
+        Minimum number of consecutive samples at the minimum or maximum value counted by `extreme_fraction`
+
+    Returns
+    -------
+    dict with
+        `samples` : number of samples
+        `mean`, `rms`, `sd`, `min`, `max` : in signal units
+        `clipping_fraction` : only if `clip_range` is given, fraction of samples at or beyond the limits
+            of the acquisition range
+        `extreme_fraction` : fraction of samples in runs of at least `extreme_run_length` consecutive
+            samples at the signal's own minimum or maximum value. A signal clipped at the rails has a
+            large extreme fraction, but so may a noise-free (e.g. stimulus) signal, so this is not a
+            clipping measure by itself. Runs split across blocks count only if a part of at least
+            `extreme_run_length` lies in one block.
+        `noise_sd` : robust estimate of the noise standard deviation from the median absolute
+            sample-to-sample difference, which is insensitive to spikes and slow drift. For signals
+            longer than `block_length`, the median of the per-block estimates.
+
+    """
+
+    samples = 0
+    total = 0.0
+    total_sq = 0.0
+    minimum = None
+    maximum = None
+    at_min = 0
+    at_max = 0
+    clipped = 0
+    noise = []
+
+    previous = None
+    for start in range(0, len(signal), block_length):
+        block = np.asarray(signal[start:start + block_length]).ravel()
+        values = block.astype(np.float64)
+
+        samples += len(block)
+        total += values.sum()
+        total_sq += np.dot(values, values)
+
+        block_min = block.min()
+        block_max = block.max()
+        if minimum is None or block_min < minimum:
+            (minimum, at_min) = (block_min, 0)
+        if maximum is None or block_max > maximum:
+            (maximum, at_max) = (block_max, 0)
+        if block_min == minimum:
+            at_min += _samples_in_runs(block == minimum, extreme_run_length)
+        if block_max == maximum:
+            at_max += _samples_in_runs(block == maximum, extreme_run_length)
+        if clip_range is not None:
+            clipped += np.count_nonzero((block <= clip_range[0]) | (block >= clip_range[1]))
+
+        # Include the last sample of the previous block so no difference is lost at block edges
+        if previous is not None:
+            values = np.concatenate(([previous], values))
+        if len(values) > 1:
+            noise.append(np.median(np.abs(np.diff(values))) * MAD_TO_SD / np.sqrt(2))
+        previous = values[-1]
+
+    if samples == 0:
+        return {'samples': 0}
+
+    mean = total / samples
+    if minimum == maximum:
+        # Constant signal: every sample is at both extremes
+        extreme = at_min
+    else:
+        extreme = at_min + at_max
+
+    summary = {'samples': samples,
+               'mean': float(mean),
+               'rms': float(np.sqrt(total_sq / samples)),
+               'sd': float(np.sqrt(max(total_sq / samples - mean ** 2, 0))),
+               'min': float(minimum),
+               'max': float(maximum),
+               'extreme_fraction': float(extreme) / samples,
+               'noise_sd': float(np.median(noise)) if len(noise) > 0 else 0.0}
+
+    if clip_range is not None:
+        summary['clipping_fraction'] = float(clipped) / samples
+
+    return summary
+
+
+def analog_signal_summary(analog_signal, block_length=BLOCK_LENGTH, clip_ranges=None):
+    """Compute `signal_summary` statistics of a `neo.AnalogSignal`
+
+    Parameters
+    ----------
+    analog_signal : neo.AnalogSignal
+    block_length : int, optional
+    clip_ranges : sequence of quantities.Quantity, optional
+        Acquisition ranges (see `parse_clip_range`). The first range whose units are compatible with the
+        signal's units is used to compute `clipping_fraction`.
+
+    Returns
+    -------
+    dict of statistics (see `signal_summary`) with an additional `units` entry
+
+    """
+
+    if isinstance(analog_signal, pq.Quantity):
+        clip_range = None
+        for r in clip_ranges or []:
+            try:
+                clip_range = tuple(r.rescale(analog_signal.units).magnitude)
+                break
+            except ValueError:
+                # Range of a different kind of channel (e.g. current vs. voltage)
+                continue
+
+        summary = signal_summary(analog_signal.magnitude, block_length=block_length, clip_range=clip_range)
+        summary['units'] = analog_signal.dimensionality.string
+    else:
+        summary = signal_summary(analog_signal, block_length=block_length)
+        summary['units'] = pq.dimensionless.dimensionality.string
+
+    return summary
@@ -0,0 +1,104 @@
+import threading
+
+import numpy as np
+import quantities as pq
+from nose.tools import istest, assert_equals, assert_true, assert_raises
+
+import ovation_neo.compression as compression
+from ovation_neo.compression import ArrayCompressor, CODECS, decode
+
+
+def check_round_trip(codec, data, chunk_length=100):
+    compressor = ArrayCompressor(codec=codec, chunk_length=chunk_length, threads=2)
+    try:
+        decoded = decode(compressor.encode(data))
+    finally:
+        compressor.close()
+
+    assert_equals(np.asarray(data).dtype, np.asarray(decoded).dtype)
+    assert_equals(np.shape(data), np.shape(decoded))
+    assert_true(np.all(np.asarray(data) == np.asarray(decoded)))
+
+    return decoded
+
+
+@istest
+def should_round_trip_all_codecs():
+    signal = (np.sin(np.linspace(0, 100, 1234)) * 1000).astype(np.int16)
+    for codec in CODECS:
+        for data in (signal, signal.astype(np.float32), signal.astype(np.float64).reshape(2, 617)):
+            check_round_trip(codec, data)
+
+
+@istest
+def should_round_trip_empty_arrays():
+    check_round_trip('delta-shuffle-zlib', np.array([], dtype=np.float32))
+
+
+@istest
+def should_preserve_units_and_metadata():
+    signal = np.arange(500, dtype=np.float32) * pq.mV
+    signal.labels = [u'time']
+    signal.sampling_rates = [10 * pq.kHz]
+
+    decoded = check_round_trip('shuffle-zlib', signal)
+
+    assert_equals(pq.mV, decoded.units)
+    assert_equals([u'time'], decoded.labels)
+    assert_equals(10 * pq.kHz, decoded.sampling_rates[0])
+
+
+@istest
+def should_compress_smooth_signals():
+    compressor = ArrayCompressor(codec='delta-shuffle-zlib', chunk_length=1024)
+    try:
+        compressor.encode((np.sin(np.linspace(0, 10, 10000)) * 2 ** 12).astype(np.int16))
+        assert_equals(1, compressor.stats.arrays)
+        assert_equals(20000, compressor.stats.raw_bytes)
+        assert_true(compressor.stats.ratio() > 2)
+    finally:
+        compressor.close()
+
+
+@istest
+def should_not_count_other_threads_as_compression_cpu():
+    if compression._thread_cpu_time is None:
+        # Only the process CPU time is available
+        return
+
+    stop = threading.Event()
+    def busy():
+        while not stop.is_set():
+            sum(range(1000))
+
+    thread = threading.Thread(target=busy)
+    thread.start()
+    compressor = ArrayCompressor(codec='zlib', threads=1)
+    try:
+        start = compression._process_cpu_time()
+        compressor.encode(np.random.randint(0, 2 ** 12, 2 ** 22).astype(np.int16))
+        process_cpu_seconds = compression._process_cpu_time() - start
+    finally:
+        stop.set()
+        thread.join()
+        compressor.close()
+
+    # The busy thread's CPU time is not compression time
+    assert_true(compressor.stats.cpu_seconds < 0.9 * process_cpu_seconds)
+
+
+@istest
+def should_encode_data_as_byte_payloads():
+    compressor = ArrayCompressor(threads=1)
+    try:
+        encoded = compressor.encode_data({'signal': np.arange(10) * pq.V})
+    finally:
+        compressor.close()
+
+    assert_equals(np.uint8, encoded['signal'].dtype)
+    assert_true(np.all(np.arange(10) == decode(encoded['signal']).magnitude))
+
+
+@istest
+def should_reject_unknown_payloads():
+    assert_raises(ValueError, decode, b'not a payload')
@@ -0,0 +1,209 @@
+import json
+import os
+import os.path
+import shutil
+import tempfile
+
+from nose.tools import istest, assert_equals, assert_true
+
+from ovation_neo.daemon import ImportDaemon
+from ovation_neo.shard import ClaimDirectory
+
+
+class TestImportDaemon(object):
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.rig_dir = os.path.join(self.tmp_dir, 'rig1')
+        os.makedirs(self.rig_dir)
+
+        self.now = 0.0
+        self.imported = []
+        self.claimed_elsewhere = set()
+        self.status_file = os.path.join(self.tmp_dir, 'status.json')
+        self.daemon = ImportDaemon([self.rig_dir],
+                                   self.import_file,
+                                   settle_time=30,
+                                   batch_interval=60,
+                                   status_file=self.status_file,
+                                   retry_interval=100,
+                                   max_retry_interval=300,
+                                   use_inotify=False,
+                                   clock=lambda: self.now)
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def import_file(self, path):
+        if path.endswith('bad.abf'):
+            raise IOError("unreadable")
+        if os.path.basename(path) in self.claimed_elsewhere:
+            return False
+        self.imported.append(os.path.basename(path))
+        return True
+
+    def write(self, name, data='x'):
+        with open(os.path.join(self.rig_dir, name), 'a') as f:
+            f.write(data)
+
+    def advance(self, seconds):
+        self.now += seconds
+        self.daemon.scan()
+
+    @istest
+    def should_queue_files_after_they_settle(self):
+        self.write('a.abf')
+        self.write('notes.txt')
+        self.advance(0)
+
+        self.advance(20)
+        assert_equals(0, len(self.daemon.queue))
+
+        # Growing files are not queued
+        self.write('a.abf', 'more data')
+        self.advance(20)
+        assert_equals(0, len(self.daemon.queue))
+
+        self.advance(30)
+        assert_equals([os.path.join(self.rig_dir, 'a.abf')], list(self.daemon.queue.keys()))
+
+    @istest
+    def should_import_queued_files_in_batches(self):
+        self.write('a.abf')
+        self.write('b.plx')
+        self.advance(0)
+        self.advance(30)
+
+        assert_true(self.daemon.batch_due())
+        self.daemon.run_batch()
+        assert_equals(['a.abf', 'b.plx'], sorted(self.imported))
+        assert_equals(30, self.daemon.last_batch['max_latency_s'])
+
+        # Imported files are not imported again; new files wait for the batch interval
+        self.write('c.abf')
+        self.advance(0)
+        self.advance(30)
+        assert_true(not self.daemon.batch_due())
+        self.advance(30)
+        assert_true(self.daemon.batch_due())
+
+    @istest
+    def should_report_status(self):
+        self.write('a.abf')
+        self.advance(0)
+        self.advance(30)
+        self.advance(5)
+
+        with open(self.status_file) as f:
+            status = json.load(f)
+
+        assert_equals(1, status['queue_depth'])
+        assert_equals(35, status['oldest_queued_s'])
+
+    @istest
+    def should_continue_after_failed_imports(self):
+        self.write('bad.abf')
+        self.write('good.abf')
+        self.advance(0)
+        self.advance(30)
+
+        self.daemon.run_batch()
+
+        assert_equals(['good.abf'], self.imported)
+        assert_equals(1, self.daemon.failed)
+        assert_equals(1, self.daemon.imported)
+
+    @istest
+    def should_retry_failed_imports_with_backoff(self):
+        self.write('bad.abf')
+        self.advance(0)
+        self.advance(30)
+        self.daemon.run_batch()
+
+        retry_times = []
+        for i in range(4):
+            start = self.now
+            while len(self.daemon.queue) == 0:
+                self.advance(10)
+            retry_times.append(self.now - start)
+            self.daemon.run_batch()
+
+        assert_equals([100, 200, 300, 300], retry_times)
+        assert_equals(5, self.daemon.failed)
+
+    @istest
+    def should_retry_files_claimed_by_other_nodes(self):
+        done = set()
+        self.daemon.is_done = lambda path: os.path.basename(path) in done
+        self.claimed_elsewhere.update(['a.abf', 'b.abf'])
+        self.write('a.abf')
+        self.write('b.abf')
+        self.advance(0)
+        self.advance(30)
+        self.daemon.run_batch()
+
+        assert_equals(0, self.daemon.imported)
+        assert_equals(2, self.daemon.skipped)
+        assert_equals(2, len(self.daemon.retries))
+
+        # The node importing a.abf finishes it; the node importing b.abf dies and its claim is released
+        done.add('a.abf')
+        self.claimed_elsewhere.clear()
+        self.advance(100)
+        assert_equals([os.path.join(self.rig_dir, 'b.abf')], list(self.daemon.queue.keys()))
+
+        self.daemon.run_batch()
+        assert_equals(['b.abf'], self.imported)
+
+        with open(self.status_file) as f:
+            status = json.load(f)
+        assert_equals(2, status['skipped'])
+        assert_equals(1, status['imported'])
+
+    @istest
+    def should_skip_done_files(self):
+        self.daemon.is_done = lambda path: path.endswith('a.abf')
+        self.write('a.abf')
+        self.advance(0)
+        self.advance(30)
+
+        assert_equals(0, len(self.daemon.queue))
+
+    @istest
+    def should_skip_finished_files(self):
+        self.write('a.abf')
+        self.write('b.abf')
+        cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        try:
+            self.daemon.mark_finished([os.path.join('rig1', 'a.abf')])
+        finally:
+            os.chdir(cwd)
+
+        self.advance(0)
+        self.advance(30)
+        assert_equals([os.path.join(self.rig_dir, 'b.abf')], list(self.daemon.queue.keys()))
+
+        # Finished files are imported again if they change
+        self.write('a.abf', 'more data')
+        self.advance(0)
+        self.advance(30)
+        assert_equals(2, len(self.daemon.queue))
+
+    @istest
+    def should_skip_files_claimed_by_relative_path(self):
+        claims = ClaimDirectory(os.path.join(self.tmp_dir, 'locks'))
+        self.daemon.is_done = claims.is_done
+        self.write('a.abf')
+
+        # Imported from the command line as a path relative to the working directory
+        cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        try:
+            with claims.hold(os.path.join('rig1', 'a.abf')) as claimed:
+                assert_true(claimed)
+        finally:
+            os.chdir(cwd)
+
+        self.advance(0)
+        self.advance(30)
+        assert_equals(0, len(self.daemon.queue))
@@ -0,0 +1,147 @@
+import os
+import os.path
+import shutil
+import tempfile
+
+from nose.tools import istest, assert_equals, assert_true
+
+import ovation_neo.follow as follow
+from ovation_neo.follow import FollowState, follow_file
+
+
+class FakeBlock(object):
+    def __init__(self, segments):
+        self.segments = segments
+
+
+class FakeSegment(object):
+    def __init__(self, index):
+        self.index = index
+
+
+class FakeURI(object):
+    def __init__(self, uri):
+        self.uri = uri
+
+    def toString(self):
+        return self.uri
+
+
+class FakeEpochGroup(object):
+    def __init__(self, uri):
+        self.uri = uri
+        self.segments = []
+
+    def getURI(self):
+        return FakeURI(self.uri)
+
+
+class FakeDataContext(object):
+    def getFileService(self):
+        return None
+
+
+class FakeContainer(object):
+    def getDataContext(self):
+        return FakeDataContext()
+
+
+class TestFollow(object):
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.tmp_dir, 'recording.abf')
+        with open(self.file_path, 'w') as f:
+            f.write('0')
+
+        self.recording = [FakeSegment(0)]
+        self.epoch_groups = []
+        self.full_reads = 0
+        self.patched = {}
+
+        def read_blocks(file_path, lazy=False):
+            if not lazy:
+                self.full_reads += 1
+            return [FakeBlock(list(self.recording))]
+
+        def insert_epoch_group(container, block, **kwargs):
+            group = FakeEpochGroup('ovation://group/{}'.format(len(self.epoch_groups)))
+            self.epoch_groups.append(group)
+            return group
+
+        def import_segment(epoch_group, segment, sources, **kwargs):
+            epoch_group.segments.append(segment.index)
+
+        for (name, fn) in (('read_blocks', read_blocks),
+                           ('insert_epoch_group', insert_epoch_group),
+                           ('import_segment', import_segment),
+                           ('wait_for_uploads', lambda *args, **kwargs: None),
+                           ('log_info', lambda msg: None)):
+            self.patched[name] = getattr(follow, name)
+            setattr(follow, name, fn)
+
+    def teardown(self):
+        for (name, fn) in self.patched.items():
+            setattr(follow, name, fn)
+        shutil.rmtree(self.tmp_dir)
+
+    @istest
+    def should_round_trip_state(self):
+        path = os.path.join(self.tmp_dir, 'state')
+        state = FollowState(path)
+        state.epoch_groups.append('ovation://group/0')
+        state.segments.append(3)
+        state.save()
+
+        restored = FollowState(path)
+        assert_equals(['ovation://group/0'], restored.epoch_groups)
+        assert_equals([3], restored.segments)
+        assert_true(not restored.complete)
+
+    @istest
+    def should_import_segments_as_they_complete(self):
+        now = [0.0]
+
+        def sleep(seconds):
+            now[0] += seconds
+            # Recording appends a segment on each of the first polls
+            if len(self.recording) < 3:
+                self.recording.append(FakeSegment(len(self.recording)))
+                with open(self.file_path, 'a') as f:
+                    f.write(str(len(self.recording)))
+
+        follow_file(self.file_path,
+                    FakeContainer(),
+                    'amplifier',
+                    [],
+                    poll_interval=1,
+                    idle_timeout=5,
+                    clock=lambda: now[0],
+                    sleep=sleep)
+
+        assert_equals(1, len(self.epoch_groups))
+        assert_equals([0, 1, 2], self.epoch_groups[0].segments)
+        assert_true(FollowState(self.file_path + follow.STATE_FILE_SUFFIX).complete)
+
+    @istest
+    def should_read_full_file_only_for_new_segments(self):
+        now = [0.0]
+
+        def sleep(seconds):
+            now[0] += seconds
+            # Recording appends data to the current segment on the first polls
+            if now[0] < 3:
+                with open(self.file_path, 'a') as f:
+                    f.write('x')
+
+        follow_file(self.file_path,
+                    FakeContainer(),
+                    'amplifier',
+                    [],
+                    poll_interval=1,
+                    idle_timeout=5,
+                    clock=lambda: now[0],
+                    sleep=sleep)
+
+        # Only the final pass, which imports the held-back segment, reads the data
+        assert_equals(1, self.full_reads)
+        assert_equals([0], self.epoch_groups[0].segments)
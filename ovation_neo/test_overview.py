@@ -0,0 +1,59 @@
+import numpy as np
+import quantities as pq
+from neo import AnalogSignal
+from nose.tools import istest, assert_equals, assert_true, assert_raises
+
+from ovation_neo.overview import minmax_pyramid, overview_data, parse_factors
+
+
+def naive_level(signal, factor):
+    bins = [signal[i:i + factor] for i in range(0, len(signal), factor)]
+    return (np.array([b.min() for b in bins]),
+            np.array([b.max() for b in bins]),
+            np.array([b.mean() for b in bins]))
+
+
+@istest
+def should_parse_factors():
+    assert_equals([4, 16, 64], parse_factors('4,16,64'))
+    assert_raises(ValueError, parse_factors, '16,4')
+    assert_raises(ValueError, parse_factors, '4,6')
+    assert_raises(ValueError, parse_factors, '')
+
+
+@istest
+def should_match_naive_decimation():
+    signal = np.random.randn(10007)
+
+    # Small blocks exercise the streaming path, including a partial final bin
+    pyramid = minmax_pyramid(signal, factors=(8, 32, 256), block_length=100)
+
+    assert_equals([8, 32, 256], [f for (f, mins, maxs, means) in pyramid])
+    for (factor, mins, maxs, means) in pyramid:
+        (expected_mins, expected_maxs, expected_means) = naive_level(signal, factor)
+        assert_true(np.array_equal(expected_mins, mins))
+        assert_true(np.array_equal(expected_maxs, maxs))
+        assert_true(np.allclose(expected_means, means))
+
+
+@istest
+def should_handle_empty_signals():
+    pyramid = minmax_pyramid(np.array([]), factors=(4, 16))
+    assert_equals(2, len(pyramid))
+    assert_equals(0, len(pyramid[0][1]))
+
+
+@istest
+def should_compute_overview_of_analog_signal():
+    signal = AnalogSignal(np.arange(1000, dtype=np.float32), units='mV', sampling_rate=10 * pq.kHz)
+
+    levels = overview_data(signal, factors=(10, 100))
+
+    assert_equals([10, 100], [factor for (factor, data) in levels])
+    ((_, fine), (_, coarse)) = levels
+    assert_equals(set(['min', 'max', 'mean']), set(fine.keys()))
+    assert_equals(100, len(fine['min']))
+    assert_equals(10, len(coarse['min']))
+    assert_equals(pq.mV, coarse['max'].units)
+    assert_equals(999, coarse['max'][-1].item())
+    assert_equals(1 * pq.kHz, fine['mean'].sampling_rates[0])
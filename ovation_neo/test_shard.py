@@ -0,0 +1,185 @@
+import os
+import os.path
+import shutil
+import tempfile
+import time
+
+from nose.tools import istest, assert_equals, assert_true, assert_false, assert_raises
+
+from ovation_neo.shard import ClaimDirectory, file_key, parse_shard, shard_files
+
+
+@istest
+def should_parse_shards():
+    assert_equals((0, 4), parse_shard('0/4'))
+    assert_equals((3, 4), parse_shard('3/4'))
+    assert_raises(ValueError, parse_shard, '4/4')
+    assert_raises(ValueError, parse_shard, '1')
+    assert_raises(ValueError, parse_shard, 'a/b')
+
+
+@istest
+def should_partition_files_by_hash():
+    files = ['rig{}/file{}.abf'.format(i % 3, i) for i in range(100)]
+
+    shards = [shard_files(files, i, 4) for i in range(4)]
+
+    assert_equals(sorted(files), sorted(sum(shards, [])))
+    assert_true(all(len(s) > 0 for s in shards))
+    assert_equals(shards[1], shard_files(list(files), 1, 4))
+
+
+@istest
+def should_key_non_ascii_paths():
+    assert_equals(file_key(b'rig1/caf\xc3\xa9.abf'), file_key(b'rig1/caf\xc3\xa9.abf'))
+    assert_true(file_key(b'rig1/caf\xe9.abf') != file_key(b'rig1/caf\xc3\xa9.abf'))
+
+
+class TestFileSystem(object):
+    def setup(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_file(self, name, size):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        return path
+
+    @istest
+    def should_balance_shards_by_size(self):
+        files = [self.make_file('f{}.abf'.format(i), size) for (i, size) in enumerate([100, 60, 50, 40, 30, 20, 10])]
+
+        shards = [shard_files(files, i, 2, strategy='size') for i in range(2)]
+
+        assert_equals(sorted(files), sorted(sum(shards, [])))
+        loads = [sum(os.path.getsize(f) for f in s) for s in shards]
+        assert_true(abs(loads[0] - loads[1]) <= 10)
+
+    @istest
+    def should_claim_files_once(self):
+        lock_dir = os.path.join(self.tmp_dir, 'locks')
+        node1 = ClaimDirectory(lock_dir, node='node1')
+        node2 = ClaimDirectory(lock_dir, node='node2')
+
+        assert_true(node1.claim('file.abf'))
+        assert_false(node2.claim('file.abf'))
+
+        node1.release('file.abf', done=False)
+        assert_true(node2.claim('file.abf'))
+
+        node2.release('file.abf')
+        assert_false(node1.claim('file.abf'))
+        assert_true(node1.is_done('file.abf'))
+
+    @istest
+    def should_claim_files_by_canonical_path(self):
+        lock_dir = os.path.join(self.tmp_dir, 'locks')
+        claims = ClaimDirectory(lock_dir)
+
+        cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        try:
+            assert_true(claims.claim(os.path.join('rig1', 'file.abf')))
+        finally:
+            os.chdir(cwd)
+
+        assert_false(claims.claim(os.path.join(self.tmp_dir, 'rig1', '.', 'file.abf')))
+
+    @istest
+    def should_claim_files_relative_to_root(self):
+        lock_dir = os.path.join(self.tmp_dir, 'locks')
+        node1 = ClaimDirectory(lock_dir, node='node1', root='/mnt/data')
+        node2 = ClaimDirectory(lock_dir, node='node2', root='/data')
+
+        assert_true(node1.claim('/mnt/data/rig1/file.abf'))
+        assert_false(node2.claim('/data/rig1/file.abf'))
+
+    @istest
+    def should_claim_non_ascii_paths(self):
+        claims = ClaimDirectory(os.path.join(self.tmp_dir, 'locks'))
+
+        assert_true(claims.claim(b'caf\xe9.abf'))
+        claims.release(b'caf\xe9.abf')
+        assert_true(claims.is_done(b'caf\xe9.abf'))
+
+    @istest
+    def should_release_stale_claims(self):
+        lock_dir = os.path.join(self.tmp_dir, 'locks')
+        dead_node = ClaimDirectory(lock_dir, timeout=60, node='dead')
+        node = ClaimDirectory(lock_dir, timeout=60, node='live')
+
+        assert_true(dead_node.claim('file.abf'))
+        assert_false(node.claim('file.abf'))
+
+        old = time.time() - 120
+        claim_path = os.path.join(lock_dir, os.listdir(lock_dir)[0])
+        os.utime(claim_path, (old, old))
+
+        assert_true(node.claim('file.abf'))
+
+    @istest
+    def should_break_stale_claims_one_node_at_a_time(self):
+        lock_dir = os.path.join(self.tmp_dir, 'locks')
+        dead_node = ClaimDirectory(lock_dir, timeout=60, node='dead')
+        node = ClaimDirectory(lock_dir, timeout=60, node='live')
+
+        assert_true(dead_node.claim('file.abf'))
+        claim_path = os.path.join(lock_dir, os.listdir(lock_dir)[0])
+        old = time.time() - 120
+        os.utime(claim_path, (old, old))
+
+        # Another node is breaking the claim
+        break_path = claim_path + '.break'
+        open(break_path, 'w').close()
+        assert_false(node.claim('file.abf'))
+        assert_true(os.path.exists(claim_path))
+
+        # ...and stopped before releasing the break lock
+        os.utime(break_path, (old, old))
+        assert_false(node.claim('file.abf'))
+        assert_true(node.claim('file.abf'))
+        assert_false(os.path.exists(break_path))
+
+    @istest
+    def should_not_release_claims_taken_over_by_other_nodes(self):
+        lock_dir = os.path.join(self.tmp_dir, 'locks')
+        slow_node = ClaimDirectory(lock_dir, timeout=60, node='slow')
+        node = ClaimDirectory(lock_dir, timeout=60, node='live')
+
+        assert_true(slow_node.claim('file.abf'))
+        assert_true(slow_node.refresh('file.abf'))
+        claim_path = os.path.join(lock_dir, os.listdir(lock_dir)[0])
+        old = time.time() - 120
+        os.utime(claim_path, (old, old))
+        assert_true(node.claim('file.abf'))
+
+        assert_false(slow_node.refresh('file.abf'))
+        slow_node.release('file.abf', done=False)
+        assert_false(ClaimDirectory(lock_dir, node='other').claim('file.abf'))
+
+        node.release('file.abf')
+        assert_equals([], [name for name in os.listdir(lock_dir) if name.endswith('.claim')])
+
+    @istest
+    def should_release_claim_on_error(self):
+        claims = ClaimDirectory(os.path.join(self.tmp_dir, 'locks'))
+
+        try:
+            with claims.hold('file.abf') as claimed:
+                assert_true(claimed)
+                raise RuntimeError()
+        except RuntimeError:
+            pass
+
+        assert_false(claims.is_done('file.abf'))
+
+        with claims.hold('file.abf') as claimed:
+            assert_true(claimed)
+
+        assert_true(claims.is_done('file.abf'))
+
+        with claims.hold('file.abf') as claimed:
+            assert_false(claimed)
@@ -0,0 +1,71 @@
+import numpy as np
+import quantities as pq
+from neo import SpikeTrain
+from nose.tools import istest, assert_equals, assert_true, assert_raises
+
+from ovation_neo.spikes import spike_sample_index, binned_counts, spike_index_data, parse_bin_widths
+
+
+def make_spike_train():
+    return SpikeTrain([0.3, 0.1, 0.25, 1.0, 0.1005],
+                      units='s',
+                      t_start=0.0 * pq.s,
+                      t_stop=1.0 * pq.s,
+                      sampling_rate=10 * pq.kHz)
+
+
+@istest
+def should_parse_bin_widths():
+    assert_equals([0.5, 10], parse_bin_widths('0.5,10'))
+    assert_raises(ValueError, parse_bin_widths, '0,10')
+
+
+@istest
+def should_compute_sorted_sample_index():
+    index = spike_sample_index(make_spike_train())
+
+    assert_equals(np.int64, index.dtype)
+    assert_true(np.array_equal([1000, 1005, 2500, 3000, 10000], index))
+
+
+@istest
+def should_find_spikes_in_window_by_binary_search():
+    index = spike_sample_index(make_spike_train())
+
+    (start, stop) = np.searchsorted(index, [1000, 2600])
+    assert_equals(3, stop - start)
+
+
+@istest
+def should_bin_spike_counts():
+    counts = binned_counts(make_spike_train(), 100 * pq.ms)
+
+    assert_equals(10, len(counts))
+    assert_equals(np.uint8, counts.dtype)
+    assert_true(np.array_equal([0, 2, 1, 1, 0, 0, 0, 0, 0, 1], counts))
+    assert_equals(5, counts.sum())
+
+
+@istest
+def should_offset_bins_by_t_start():
+    spike_train = SpikeTrain([10.05, 10.15], units='s', t_start=10.0 * pq.s, t_stop=10.2 * pq.s)
+
+    assert_true(np.array_equal([1, 1], binned_counts(spike_train, 100 * pq.ms)))
+
+
+@istest
+def should_build_index_data():
+    artifacts = spike_index_data(make_spike_train(), bin_widths_ms=(1, 250))
+
+    assert_equals(['index', 'counts 1 ms', 'counts 250 ms'], [suffix for (suffix, data) in artifacts])
+    ((_, index), (_, fine), (_, coarse)) = artifacts
+    assert_equals(5, len(index['spike sample index']))
+    assert_equals(1000, len(fine['spike counts']))
+    assert_equals(4 * pq.Hz, coarse['spike counts'].sampling_rates[0])
+
+
+@istest
+def should_store_counts_in_narrow_types():
+    spike_train = SpikeTrain(np.linspace(0, 1, 1000, endpoint=False), units='s', t_stop=1.0 * pq.s)
+
+    assert_equals(np.uint16, binned_counts(spike_train, 1 * pq.s).dtype)
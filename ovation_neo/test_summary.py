@@ -0,0 +1,107 @@
+import numpy as np
+import quantities as pq
+from neo import AnalogSignal
+from nose.tools import istest, assert_equals, assert_almost_equals, assert_true, assert_raises
+
+from ovation_neo.summary import signal_summary, analog_signal_summary, parse_clip_range
+
+
+@istest
+def should_compute_moments():
+    signal = np.random.randn(10000) + 2
+
+    summary = signal_summary(signal, block_length=999)
+
+    assert_equals(10000, summary['samples'])
+    assert_almost_equals(signal.mean(), summary['mean'])
+    assert_almost_equals(np.sqrt(np.mean(signal ** 2)), summary['rms'])
+    assert_almost_equals(signal.std(), summary['sd'])
+    assert_equals(signal.min(), summary['min'])
+    assert_equals(signal.max(), summary['max'])
+
+
+@istest
+def should_estimate_noise():
+    signal = np.random.randn(100000) * 3 + np.linspace(0, 100, 100000)
+
+    summary = signal_summary(signal, block_length=10000)
+
+    assert_true(abs(summary['noise_sd'] - 3) < 0.2)
+
+
+@istest
+def should_parse_clip_ranges():
+    assert_true(np.all(pq.Quantity([-10, 10], 'V') == parse_clip_range('-10,10V')))
+    assert_true(np.all(pq.Quantity([-200, 200], 'mV') == parse_clip_range(' -200 , 200 mV')))
+    assert_raises(ValueError, parse_clip_range, '-10,10')
+    assert_raises(ValueError, parse_clip_range, '10,-10V')
+    assert_raises(ValueError, parse_clip_range, '-10,10bogons')
+
+
+@istest
+def should_count_runs_at_extremes():
+    signal = np.zeros(1000)
+    signal[100:150] = 5
+    signal[500:520] = -5
+    signal[700] = 5 # isolated extreme samples
+    signal[800:802] = -5
+
+    summary = signal_summary(signal, block_length=300)
+
+    assert_almost_equals(70 / 1000.0, summary['extreme_fraction'])
+    assert_true('clipping_fraction' not in summary)
+
+
+@istest
+def should_detect_clipping_at_acquisition_range():
+    signal = np.clip(10 * np.sin(np.linspace(0, 20 * np.pi, 10000)), -5, 5)
+
+    summary = signal_summary(signal, block_length=777, clip_range=(-5, 5))
+
+    assert_almost_equals(np.mean(np.abs(signal) == 5), summary['clipping_fraction'])
+    assert_true(summary['clipping_fraction'] > 0.6)
+
+
+@istest
+def should_not_report_clipping_for_noise_free_signals():
+    # Quantized 1 Hz stimulus at 20 kHz, far inside the acquisition range
+    signal = np.round(np.sin(np.linspace(0, 2 * np.pi, 20000)) * 2 ** 10) / 2 ** 10
+
+    summary = signal_summary(signal, clip_range=(-10, 10))
+
+    assert_equals(0.0, summary['clipping_fraction'])
+    assert_true(summary['extreme_fraction'] > 0.01)
+
+
+@istest
+def should_not_report_extremes_for_noisy_signals():
+    summary = signal_summary(np.random.randn(10000), block_length=777)
+    assert_equals(0.0, summary['extreme_fraction'])
+
+
+@istest
+def should_summarize_analog_signal():
+    signal = AnalogSignal(np.ones(100, dtype=np.float32), units='mV', sampling_rate=1 * pq.kHz)
+
+    summary = analog_signal_summary(signal)
+
+    assert_equals('mV', summary['units'])
+    assert_equals(1.0, summary['mean'])
+    assert_equals(1.0, summary['extreme_fraction'])
+    assert_equals(0.0, summary['noise_sd'])
+
+
+@istest
+def should_use_clip_range_in_signal_units():
+    signal = AnalogSignal(np.array([-200, 0, 100, 200], dtype=np.float32), units='mV', sampling_rate=1 * pq.kHz)
+
+    summary = analog_signal_summary(signal, clip_ranges=[parse_clip_range('-2,2nA'), parse_clip_range('-0.2,0.2V')])
+    assert_equals(0.5, summary['clipping_fraction'])
+
+    summary = analog_signal_summary(signal, clip_ranges=[parse_clip_range('-2,2nA')])
+    assert_true('clipping_fraction' not in summary)
+
+
+@istest
+def should_summarize_empty_signal():
+    assert_equals({'samples': 0}, signal_summary(np.array([])))
@@ -0,0 +1,117 @@
+from nose.tools import istest, assert_equals, assert_almost_equals, assert_raises
+
+from ovation_neo.throttle import TokenBucket, UploadThrottle, parse_rate
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeFileService(object):
+    def __init__(self, pending=0):
+        self.pending = pending
+        self.waits = 0
+
+    def hasPendingUploads(self):
+        return self.pending > 0
+
+    def waitForPendingUploads(self, timeout, unit):
+        self.waits += 1
+        self.pending = 0
+
+
+@istest
+def should_parse_rates():
+    assert_equals(100, parse_rate('100'))
+    assert_equals(512 * 1024, parse_rate('512K'))
+    assert_equals(2.5 * 1024 ** 2, parse_rate('2.5M'))
+    assert_equals(1024 ** 3, parse_rate('1GB/s'))
+    assert_raises(ValueError, parse_rate, 'fast')
+    assert_raises(ValueError, parse_rate, '0')
+
+
+@istest
+def should_not_wait_within_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(100, clock=clock, sleep=clock.sleep)
+
+    assert_equals(0, bucket.consume(100))
+    assert_equals(0, clock.now)
+
+
+@istest
+def should_limit_average_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(100, clock=clock, sleep=clock.sleep)
+
+    for i in range(10):
+        bucket.consume(50)
+
+    # 100 bytes of initial burst, remaining 400 bytes at 100 B/s
+    assert_almost_equals(4.0, clock.now)
+
+
+@istest
+def should_admit_requests_larger_than_bucket():
+    clock = FakeClock()
+    bucket = TokenBucket(100, clock=clock, sleep=clock.sleep)
+
+    bucket.consume(1000)
+    assert_equals(0, clock.now)
+
+    bucket.consume(1)
+    assert_almost_equals(9.01, clock.now)
+
+
+@istest
+def should_wait_for_pending_uploads():
+    clock = FakeClock()
+    fs = FakeFileService()
+    throttle = UploadThrottle(max_pending=2, clock=clock, sleep=clock.sleep)
+
+    for i in range(2):
+        throttle.acquire(fs, 10)
+        fs.pending += 1
+
+    assert_equals(0, fs.waits)
+
+    throttle.acquire(fs, 10)
+    assert_equals(1, fs.waits)
+    assert_equals(1, throttle.pending)
+    assert_equals(30, throttle.bytes_submitted)
+
+
+@istest
+def should_report_average_rate():
+    clock = FakeClock()
+    throttle = UploadThrottle(max_rate=100, clock=clock, sleep=clock.sleep)
+
+    for i in range(5):
+        throttle.acquire(FakeFileService(), 100)
+
+    assert_equals(500, throttle.bytes_submitted)
+    assert_almost_equals(4.0, throttle.seconds_throttled)
+    assert_almost_equals(125.0, throttle.rate())
+
+
+@istest
+def should_report_rate_since_last_report():
+    clock = FakeClock()
+    throttle = UploadThrottle(max_rate=100, report_interval=1000, clock=clock, sleep=clock.sleep)
+
+    throttle.acquire(FakeFileService(), 100)
+    clock.now += 1000 # idle
+    throttle.report()
+
+    for i in range(5):
+        throttle.acquire(FakeFileService(), 100)
+
+    # 500 bytes in 4 s; idle time before the last report is not included
+    assert_almost_equals(125.0, throttle.rate())
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides upload bandwidth throttling for data handed to the Ovation file service
+"""
+
+import re
+import time
+
+from ovation_neo.importer import log_info, wait_for_uploads
+
+__copyright__ = 'Copyright (c) 2013. Physion Consulting. All rights reserved.'
+
+
+__RATE_SUFFIXES = {
+    '' : 1,
+    'K' : 1024,
+    'M' : 1024 ** 2,
+    'G' : 1024 ** 3
+}
+
+def parse_rate(rate):
+    """Parse a byte rate such as `500K` or `2.5M` (bytes per second)
+
+    Parameters
+    ----------
+    rate : str
+        Rate in bytes per second with an optional K, M or G (binary) suffix
+
+    Returns
+    -------
+    Rate in bytes per second as a float
+
+    """
+
+    match = re.match(r'^\s*([0-9]*\.?[0-9]+)\s*([KMG]?)(?:i?B)?(?:/s)?\s*$', str(rate), re.IGNORECASE)
+    if match is None:
+        raise ValueError("Unable to parse upload rate '{}'".format(rate))
+
+    value = float(match.group(1)) * __RATE_SUFFIXES[match.group(2).upper()]
+    if value <= 0:
+        raise ValueError("Upload rate must be positive")
+
+    return value
+
+
+def format_rate(bytes_per_second):
+    for suffix in ('G', 'M', 'K'):
+        if bytes_per_second >= __RATE_SUFFIXES[suffix]:
+            return "{:.1f} {}B/s".format(bytes_per_second / __RATE_SUFFIXES[suffix], suffix)
+
+    return "{:.0f} B/s".format(bytes_per_second)
+
+
+class TokenBucket(object):
+    """Token bucket rate limiter
+
+    Tokens accumulate at `rate` per second up to `capacity`. Requests larger than the bucket
+    are admitted once the bucket is full and leave it in debt, so a single large request is never
+    blocked forever and the long-run average still converges to `rate`.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.time, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity is not None else self.rate
+        self.tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._timestamp = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._timestamp) * self.rate)
+        self._timestamp = now
+
+    def consume(self, amount):
+        """Block until `amount` tokens are available and take them
+
+        Returns
+        -------
+        Seconds spent waiting
+
+        """
+
+        waited = 0.0
+        needed = min(float(amount), self.capacity)
+
+        self._refill()
+        while self.tokens < needed:
+            delay = (needed - self.tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+            self._refill()
+
+        self.tokens -= amount
+        return waited
+
+
+class UploadThrottle(object):
+    """Limits the average rate and number of pending uploads handed to the Ovation file service
+
+    The throttle paces the submission of data to the file service, which then uploads each submitted
+    Measurement or AnalysisRecord file at full network speed. It therefore limits the average upload
+    bandwidth, not the peak bandwidth while a (possibly large) file is uploading.
+
+    Parameters
+    ----------
+    max_rate : float, optional
+        Maximum average rate of submitted data in bytes per second. Unlimited if `None`.
+    max_pending : int, optional
+        Maximum number of inserted data files that may be waiting for upload before the importer
+        blocks for the file service to drain. Unlimited if `None`.
+    report_interval : float, optional
+        Minimum number of seconds between upload rate log messages
+    """
+
+    def __init__(self, max_rate=None, max_pending=None, report_interval=30, clock=time.time, sleep=time.sleep):
+        self.max_pending = max_pending
+        self.report_interval = report_interval
+        self.bucket = TokenBucket(max_rate, clock=clock, sleep=sleep) if max_rate else None
+
+        self.bytes_submitted = 0
+        self.uploads_submitted = 0
+        self.pending = 0
+        self.seconds_throttled = 0.0
+
+        self._clock = clock
+        self._start = clock()
+        self._last_report = self._start
+        self._last_report_bytes = 0
+
+    def acquire(self, file_service, nbytes):
+        """Wait until an upload of `nbytes` may be handed to `file_service`"""
+
+        if self.max_pending is not None:
+            if not file_service.hasPendingUploads():
+                self.pending = 0
+
+            if self.pending >= self.max_pending:
+                log_info("{} uploads pending".format(self.pending))
+                start = self._clock()
+                wait_for_uploads(file_service)
+                self.seconds_throttled += self._clock() - start
+                self.pending = 0
+
+        if self.bucket is not None:
+            self.seconds_throttled += self.bucket.consume(nbytes)
+
+        self.pending += 1
+        self.uploads_submitted += 1
+        self.bytes_submitted += nbytes
+
+        if self._clock() - self._last_report >= self.report_interval:
+            self.report()
+
+    def rate(self):
+        """Submitted bytes per second since the last report (or since this throttle was created)"""
+
+        elapsed = self._clock() - self._last_report
+        if elapsed <= 0:
+            return 0.0
+
+        return (self.bytes_submitted - self._last_report_bytes) / elapsed
+
+    def report(self):
+        rate = self.rate()
+        self._last_report = self._clock()
+        self._last_report_bytes = self.bytes_submitted
+        log_info("Uploads: {} files, {:.1f} MB submitted, {} since last report ({:.1f} s throttled)".format(
+            self.uploads_submitted,
+            self.bytes_submitted / 1024.0 ** 2,
+            format_rate(rate),
+            self.seconds_throttled))